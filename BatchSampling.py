@@ -0,0 +1,228 @@
+#************************************************************************************
+# Questo file contiene le funzioni per fare il sampling di tanti poligoni insieme,
+# a partire dal db lungo prodotto da DataImport.db_preparation
+#************************************************************************************
+
+from GeoSampling import Sampling as samp
+from GeoSampling import PolygonStore as ps
+
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+
+#-----------------------------------------------------
+# Separazione del db lungo in poligoni
+#-----------------------------------------------------
+
+def split_polygons(figures):
+
+    """Separazione del db lungo in poligoni
+
+    A partire dal db lungo (una riga per ogni punto, con le colonne ID_EXT, Latitude e Longitude,
+    come quello prodotto da db_preparation), restituisce una lista di terne (ID_EXT, latitudine, longitudine),
+    una per ogni poligono, con gli array di coordinate nell'ordine originale dei punti.
+    Ogni punto deve avere un ID_EXT: se qualche ID_EXT manca (NaN), solleva un ValueError.
+    """
+
+    codes, ids = pd.factorize(figures['ID_EXT'])
+
+    # pd.factorize dà il codice -1 agli ID_EXT mancanti
+    missing = int((codes < 0).sum())
+    if missing:
+        raise ValueError("%d punti del db lungo non hanno ID_EXT" % missing)
+
+    # Ordinamento stabile: i punti di ogni poligono restano nel loro ordine
+    order = np.argsort(codes, kind = 'stable')
+    bounds = np.cumsum(np.bincount(codes, minlength = len(ids)))[:-1]
+
+    lat = np.split(figures['Latitude'].to_numpy(dtype = float)[order], bounds)
+    lon = np.split(figures['Longitude'].to_numpy(dtype = float)[order], bounds)
+
+    return list(zip(ids, lat, lon))
+
+
+#-----------------------------------------------------
+# Gruppi di poligoni bilanciati per numero di punti
+#-----------------------------------------------------
+
+def balanced_chunks(sizes, chunk_points = 200000):
+
+    """Gruppi di poligoni bilanciati per numero di punti
+
+    Data la lista del numero di punti di ogni poligono, restituisce una lista di gruppi (liste di
+    posizioni) tali che ogni gruppo contiene al massimo circa chunk_points punti. I poligoni sono
+    considerati dal più grande al più piccolo: un poligono più grande di chunk_points forma un gruppo
+    da solo, e i gruppi più pesanti vengono creati (e quindi mandati ai processi) per primi,
+    così che un unico poligono enorme non blocchi un processo alla fine del lavoro.
+    """
+
+    chunks = []
+    current = []
+    current_points = 0
+
+    for pos in np.argsort(sizes, kind = 'stable')[::-1].tolist():
+
+        if current and current_points + sizes[pos] > chunk_points:
+            chunks.append(current)
+            current = []
+            current_points = 0
+
+        current.append(pos)
+        current_points = current_points + sizes[pos]
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+#-----------------------------------------------------
+# Sampling di un gruppo di poligoni (in un processo)
+#-----------------------------------------------------
+
+def sample_chunk(polygons, params):
+
+    """Sampling di un gruppo di poligoni
+
+    Applica Sampling.Sampling a ogni poligono (terne ID_EXT, latitudine, longitudine) con i parametri
+    params. Restituisce gli array di ID_EXT, indice del punto nel poligono, latitudine e longitudine
+    dei punti rimasti, e la lista dei poligoni falliti, con il messaggio di errore.
+    Un errore su un poligono non interrompe il sampling degli altri.
+    """
+
+    ids, points, lats, lons = [], [], [], []
+    failures = []
+
+    for id_ext, lat, lon in polygons:
+
+        try:
+            sampled = samp.Sampling(ps.PolygonView(id_ext, lat, lon), **params)
+        except Exception as error:
+            failures.append((id_ext, repr(error)))
+            continue
+
+        ids.append(np.repeat(np.array([id_ext], dtype = object), len(sampled)))
+        points.append(sampled.index.to_numpy())
+        lats.append(sampled['Latitude'].to_numpy())
+        lons.append(sampled['Longitude'].to_numpy())
+
+    return ids, points, lats, lons, failures
+
+
+#-----------------------------------------------------
+# Sampling di tutto il db lungo
+#-----------------------------------------------------
+
+def BatchSampling(figures, workers = None, chunk_points = 200000, **params):
+
+    """Sampling di tutti i poligoni del db lungo
+
+    A partire dal db lungo prodotto da db_preparation (colonne ID_EXT, Latitude, Longitude), fa il sampling
+    di ogni poligono con Sampling.Sampling (i parametri params sono quelli di Sampling) su un pool di
+    workers processi (workers = 1: tutto nel processo corrente). I poligoni sono mandati ai processi
+    in gruppi bilanciati per numero di punti (balanced_chunks).
+    Restituisce due dataframe: i punti rimasti, con le colonne ID_EXT, Point (posizione del punto nel suo
+    poligono, da 0, come l'indice restituito da Sampling; NON la riga del db lungo), Latitude e Longitude;
+    e i poligoni falliti, con le colonne ID_EXT ed Error.
+    Con più processi gli hooks di Sampling (params['hooks']) vengono eseguiti nei processi: per raccogliere
+    i record di tutto il batch si usa Instrumentation.JsonLinesWriter (oppure workers = 1).
+    """
+
+    polygons = split_polygons(figures)
+    chunks = balanced_chunks([len(lat) for _, lat, _ in polygons], chunk_points)
+    chunks = [[polygons[pos] for pos in chunk] for chunk in chunks]
+
+    if workers == 1:
+        results = [sample_chunk(chunk, params) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            results = list(pool.map(sample_chunk, chunks, [params]*len(chunks)))
+
+    return collect_results(results, [id_ext for id_ext, _, _ in polygons])
+
+
+#-----------------------------------------------------
+# Sampling di un PolygonStore salvato su disco
+#-----------------------------------------------------
+
+def sample_store_chunk(path, positions, ids, params):
+
+    """Sampling di un gruppo di poligoni di un PolygonStore su disco
+
+    Ogni processo riapre solo gli array dell'archivio con np.memmap (le pagine sono condivise tra i
+    processi), senza rileggere la tabella degli attributi: gli ID_EXT dei poligoni nelle posizioni
+    indicate arrivano già dal processo principale (ids). Poi applica sample_chunk a questi poligoni.
+    """
+
+    store = ps.PolygonStore.open(path, attributes = False)
+    offsets = store.offsets
+
+    polygons = [(id_ext, store.lat[offsets[k]:offsets[k+1]], store.lon[offsets[k]:offsets[k+1]])
+                for k, id_ext in zip(positions, ids)]
+
+    return sample_chunk(polygons, params)
+
+
+def StoreSampling(path, workers = None, chunk_points = 200000, **params):
+
+    """Sampling di tutti i poligoni di un PolygonStore salvato su disco
+
+    Come BatchSampling, ma i processi ricevono solo il percorso dell'archivio, le posizioni e gli ID_EXT
+    dei poligoni, e leggono le coordinate direttamente dai file (np.memmap) invece di riceverle serializzate.
+    """
+
+    store = ps.PolygonStore.open(path)
+    chunks = balanced_chunks(store.sizes().tolist(), chunk_points)
+
+    ids_order = store.attributes['ID_EXT'].tolist()
+    chunk_ids = [[ids_order[k] for k in chunk] for chunk in chunks]
+
+    if workers == 1:
+        results = [sample_store_chunk(path, chunk, ids, params) for chunk, ids in zip(chunks, chunk_ids)]
+    else:
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            results = list(pool.map(sample_store_chunk, [path]*len(chunks), chunks, chunk_ids,
+                                    [params]*len(chunks)))
+
+    return collect_results(results, ids_order)
+
+
+#-----------------------------------------------------
+# Unione dei risultati
+#-----------------------------------------------------
+
+def collect_results(results, ids_order):
+
+    """Unione dei risultati dei gruppi di poligoni
+
+    A partire dai risultati di sample_chunk per ogni gruppo, restituisce il dataframe dei punti rimasti
+    (ID_EXT, Point, Latitude, Longitude), con i poligoni nell'ordine di ids_order,
+    e il dataframe dei poligoni falliti (ID_EXT, Error).
+    """
+
+    ids, points, lats, lons, failures = [], [], [], [], []
+
+    for result in results:
+        ids.extend(result[0])
+        points.extend(result[1])
+        lats.extend(result[2])
+        lons.extend(result[3])
+        failures.extend(result[4])
+
+    if ids:
+        sampled = pd.DataFrame({
+            'ID_EXT': np.concatenate(ids),
+            'Point': np.concatenate(points),
+            'Latitude': np.concatenate(lats),
+            'Longitude': np.concatenate(lons)
+        })
+
+        # Poligoni nell'ordine di partenza (i gruppi arrivano in ordine di dimensione)
+        rank = pd.Index(ids_order).get_indexer(sampled['ID_EXT'])
+        sampled = sampled.iloc[np.argsort(rank, kind = 'stable')].reset_index(drop = True)
+    else:
+        sampled = pd.DataFrame(columns = ['ID_EXT', 'Point', 'Latitude', 'Longitude'])
+
+    failed = pd.DataFrame(failures, columns = ['ID_EXT', 'Error'])
+
+    return sampled, failed
@@ -0,0 +1,354 @@
+#************************************************************************************
+# Questo file contiene il benchmark del pacchetto: un generatore deterministico di
+# poligoni sintetici e le funzioni per misurare i tempi e confrontarli con una baseline
+#************************************************************************************
+
+from GeoSampling import RemovingPoints as rp
+from GeoSampling import RemovingLength as rl
+from GeoSampling import RemovingArea as ra
+from GeoSampling import ObjFunZoom as z
+from GeoSampling import DBSCANsampling as dbsamp
+from GeoSampling import Sampling as samp
+from GeoSampling import Metrics as mtr
+from GeoSampling import Periodics as pcs
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+#-----------------------------------------------------
+# Generatore di poligoni sintetici
+#-----------------------------------------------------
+
+def synthetic_ring(n, seed = 0, duplicates = 0.05, collinear = 0.3, clusters = 0.1,
+                   segment_meter = 5, lat0 = 45.46, lon0 = 9.19):
+
+    """Poligono sintetico di n punti, nel formato di input del pacchetto (n+1 righe)
+
+    Il poligono somiglia al contorno di una particella catastale, ed è sempre lo stesso a parità di
+    n e seed. È costruito così:
+    - un contorno di base frastagliato: un profilo radiale irregolare, con gradini ad angolo retto;
+    - lunghe sequenze di punti allineati su alcuni lati (circa collinear*n punti);
+    - gruppi densi di segmenti molto corti (a zig-zag, di circa 30cm) su altri lati (circa clusters*n punti);
+    - punti quasi duplicati (circa duplicates*n punti): copie del punto precedente, identiche oppure
+      spostate di circa 1cm.
+    I lati del contorno di base sono lunghi circa segment_meter metri; il centro è in (lat0, lon0).
+    """
+
+    rng = np.random.default_rng(seed)
+
+    n_dup = min(int(round(duplicates*n)), n - 3)
+    n_path = n - n_dup
+    n_base = min(n_path, max(3, int(round(n_path*(1 - collinear - clusters)))))
+    n_clu = min(n_path - n_base, int(round(clusters*n_path)))
+    n_col = n_path - n_base - n_clu
+
+    # Contorno di base (in metri): profilo radiale irregolare, con rumore dell'ordine di un segmento
+    radius = n_base*segment_meter/(2*math.pi)
+    angles = np.sort(rng.uniform(0, 2*math.pi, n_base))
+    profile = radius*(1 + 0.15*np.sin(3*angles + rng.uniform(0, 2*math.pi)))
+    profile = profile + segment_meter*rng.standard_normal(n_base)
+    x = profile*np.cos(angles)
+    y = profile*np.sin(angles)
+
+    # Gradini ad angolo retto: un punto ogni due prende la x del precedente e la y del successivo
+    steps = np.arange(1, n_base - 1, 2)
+    x[steps] = x[steps - 1]
+    y[steps] = y[steps + 1]
+
+    # Punti in più sui lati: posizione t lungo il lato e spostamento perpendicolare (in metri)
+    edges = np.arange(n_base)
+    col_edges = rng.choice(n_base, max(1, n_base//10), replace = False)
+    col_edge = np.sort(rng.choice(col_edges, n_col))
+    col_t = rng.uniform(0, 1, n_col)
+
+    clu_edges = rng.choice(n_base, max(1, n_base//20), replace = False)
+    clu_start = rng.uniform(0, 0.9, n_base)
+    clu_edge = np.sort(rng.choice(clu_edges, n_clu))
+    clu_t = clu_start[clu_edge] + 0.1*rng.uniform(0, 1, n_clu)
+    clu_offset = 0.3*np.where(np.arange(n_clu) % 2 == 0, 1, -1)
+
+    edge = np.concatenate([edges, col_edge, clu_edge])
+    t = np.concatenate([np.zeros(n_base), col_t, clu_t])
+    offset = np.concatenate([np.zeros(n_base + n_col), clu_offset])
+
+    order = np.lexsort((t, edge))
+    edge, t, offset = edge[order], t[order], offset[order]
+
+    dx = np.roll(x, -1)[edge] - x[edge]
+    dy = np.roll(y, -1)[edge] - y[edge]
+    norm = np.maximum(np.hypot(dx, dy), 1e-9)
+    px = x[edge] + t*dx - offset*dy/norm
+    py = y[edge] + t*dy + offset*dx/norm
+
+    # Punti quasi duplicati, subito dopo il punto copiato
+    counts = 1 + np.bincount(rng.choice(n_path, n_dup), minlength = n_path)
+    px = np.repeat(px, counts)
+    py = np.repeat(py, counts)
+
+    copies = np.ones(n, dtype = bool)
+    copies[np.cumsum(counts) - counts] = False
+    jitter = np.where(rng.random(n) < 0.5, 0, 0.01)
+    px = px + copies*jitter*rng.standard_normal(n)
+    py = py + copies*jitter*rng.standard_normal(n)
+
+    # Da metri a gradi, e chiusura del poligono (la riga N uguale alla riga 0)
+    degrees = 360/(2*math.pi*6371000)
+    lat = np.append(lat0 + degrees*py, lat0 + degrees*py[0])
+    lon = np.append(lon0 + degrees*px, lon0 + degrees*px[0])
+
+    return pd.DataFrame({'Latitude': lat, 'Longitude': lon})
+
+
+#-----------------------------------------------------
+# Funzioni misurate dal benchmark
+#-----------------------------------------------------
+
+def benchmark_inputs(ring, detail = 5):
+
+    """Dati di ingresso delle funzioni del benchmark, preparati una volta sola per ogni poligono
+
+    Restituisce un dizionario con: il poligono nel formato di input (ring), il dataframe senza l'ultima
+    riga (reset), con le condizioni al contorno (padded), il dettaglio (detail, in metri) e il poligono
+    campionato (sampled), usato dalle metriche.
+    Il dettaglio è fisso: sui poligoni sintetici r_detailq cade sui gruppi di segmenti corti e
+    restituirebbe quasi sempre 0.01.
+    """
+
+    reset = pcs.reset_data(ring)
+
+    return {'ring': ring, 'reset': reset, 'padded': pcs.PC(reset), 'detail': detail,
+            'sampled': samp.Sampling(ring, detail)}
+
+
+# Nome, funzione (applicata ai dati di benchmark_inputs) e numero massimo di punti (None: nessun limite)
+BENCHMARKS = [
+    ('rem_overlap', lambda d: rp.rem_overlap(d['padded'], identity = False), None),
+    ('rem_median', lambda d: rp.rem_median(d['padded']), None),
+    ('rem_buffer', lambda d: rp.rem_buffer(d['padded'], tol_meter = 0.5*d['detail']), None),
+    ('rem_length', lambda d: rl.rem_length(d['padded'], lenmin_meter = 2*d['detail']), None),
+    ('rem_finelength', lambda d: rl.rem_finelength(d['padded'], lenmin_meter = 2*d['detail']), None),
+    ('rem_visvalingam', lambda d: ra.rem_visvalingam(d['reset'], area_meter2 = 0.5*d['detail']**2), None),
+    ('ObjFunZoom', lambda d: z.ObjFunZoom(d['reset'], d_meter = 0.5*d['detail']), 100000),
+    ('DBSCANsampling', lambda d: dbsamp.DBSCANsampling(d['reset'], eps_meter = 0.5*d['detail']), None),
+    ('Sampling', lambda d: samp.Sampling(d['ring'], d['detail']), None),
+    ('Sampling_zoom', lambda d: samp.Sampling(d['ring'], d['detail'], clustering = True, ifzoom = True), 100000),
+    ('Sampling_dbscan', lambda d: samp.Sampling(d['ring'], d['detail'], clustering = True), None),
+    ('Sampling_visvalingam', lambda d: samp.Sampling(d['ring'], d['detail'], visvalingam = True), None),
+    ('PolyArea', lambda d: mtr.PolyArea(d['ring']), None),
+    ('diffPoints', lambda d: mtr.diffPoints(d['ring'], d['sampled']), None),
+    ('diffAbsArea', lambda d: mtr.diffAbsArea(d['ring'], d['sampled']), None),
+    ('diffArea', lambda d: mtr.diffArea(d['ring'], d['sampled']), None),
+    ('maxDistance', lambda d: mtr.maxDistance(d['ring'], d['sampled']), None),
+    ('relativeDistance', lambda d: mtr.relativeDistance(d['ring'], d['sampled'], d['detail']), None),
+    ('quality_report', lambda d: mtr.quality_report(d['ring'], d['sampled'], d['detail']), None),
+]
+
+
+#-----------------------------------------------------
+# Esecuzione del benchmark
+#-----------------------------------------------------
+
+def time_function(function, dati, repeat = 3):
+
+    """Tempi (in secondi) di repeat esecuzioni di function(dati): restituisce il minimo e la mediana."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(dati)
+        times.append(time.perf_counter() - start)
+
+    return min(times), float(np.median(times))
+
+
+def run_benchmark(sizes = (10, 100, 1000, 10000, 100000), seed = 0, repeat = 3, names = None,
+                  detail = 5, verbose = False):
+
+    """Esecuzione del benchmark
+
+    Per ogni numero di punti in sizes genera un poligono con synthetic_ring (stesso seed) e misura ogni
+    funzione di BENCHMARKS (oppure solo quelle con il nome in names), repeat volte, con il dettaglio
+    detail (in metri).
+    Restituisce una lista di record (dizionari) con le chiavi name, size, seed, detail, repeat, best e median
+    (tempi in secondi).
+    """
+
+    results = []
+
+    for size in sizes:
+
+        dati = benchmark_inputs(synthetic_ring(size, seed), detail)
+
+        for name, function, max_size in BENCHMARKS:
+
+            if names is not None and name not in names:
+                continue
+            if max_size is not None and size > max_size:
+                continue
+
+            best, median = time_function(function, dati, repeat)
+            results.append({'name': name, 'size': size, 'seed': seed, 'detail': detail, 'repeat': repeat,
+                            'best': best, 'median': median})
+
+            if verbose:
+                print(name, size, best)
+
+    return results
+
+
+#-----------------------------------------------------
+# Baseline: salvataggio e confronto
+#-----------------------------------------------------
+
+def environment():
+
+    """Descrizione dell'ambiente in cui è stato eseguito il benchmark."""
+
+    import sklearn
+    import shapely
+
+    return {'date': datetime.datetime.now().isoformat(timespec = 'seconds'),
+            'python': platform.python_version(), 'machine': platform.machine(),
+            'platform': platform.platform(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'sklearn': sklearn.__version__, 'shapely': shapely.__version__}
+
+
+def save_baseline(results, path):
+
+    """Salva i risultati del benchmark in un file JSON, insieme alla descrizione dell'ambiente."""
+
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent = 1)
+
+
+def load_baseline(path):
+
+    """Legge i risultati salvati da save_baseline."""
+
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare(results, baseline, tolerance = 0.2):
+
+    """Confronto tra i risultati del benchmark e una baseline
+
+    Restituisce un dataframe con una riga per ogni funzione e numero di punti presenti in entrambi, con i
+    tempi migliori (best, best_baseline), il rapporto ratio = best/best_baseline e lo stato: 'slower' se
+    il rapporto supera 1 + tolerance, 'faster' se è sotto 1/(1 + tolerance), altrimenti 'same'.
+    """
+
+    current = pd.DataFrame(results)[['name', 'size', 'best']]
+    previous = pd.DataFrame(baseline)[['name', 'size', 'best']]
+
+    table = current.merge(previous, on = ['name', 'size'], suffixes = ('', '_baseline'))
+    table['ratio'] = table['best']/table['best_baseline']
+    table['status'] = np.where(table['ratio'] > 1 + tolerance, 'slower',
+                               np.where(table['ratio'] < 1/(1 + tolerance), 'faster', 'same'))
+
+    return table
+
+
+#-----------------------------------------------------
+# Tempo di import del pacchetto senza grafica
+#-----------------------------------------------------
+
+# Moduli del sampling e delle metriche, e librerie che non devono essere caricate importandoli
+HEADLESS_MODULES = ['GeoSampling.Sampling', 'GeoSampling.Metrics', 'GeoSampling.BatchSampling']
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'sklearn']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+print(json.dumps({{'time': time.perf_counter() - start,
+                  'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def import_time(modules = HEADLESS_MODULES, heavy = HEAVY_MODULES, repeat = 3):
+
+    """Tempo di import dei moduli, ognuno misurato in un nuovo processo Python
+
+    Restituisce il tempo minimo (in secondi) su repeat processi e la lista delle librerie di heavy
+    che risultano caricate dopo l'import.
+    """
+
+    script = IMPORT_SCRIPT.format(modules = list(modules), heavy = list(heavy))
+    env = dict(os.environ, PYTHONPATH = os.pathsep.join(path for path in sys.path if path))
+
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], env = env, check = True,
+                                capture_output = True, text = True).stdout
+        result = json.loads(output)
+        times.append(result['time'])
+
+    return min(times), result['loaded']
+
+
+def check_import_budget(budget = 1.0, modules = HEADLESS_MODULES, heavy = HEAVY_MODULES, repeat = 3):
+
+    """Controllo del tempo di import del sampling e delle metriche
+
+    Solleva un'eccezione se importare modules (in un nuovo processo) richiede più di budget secondi,
+    oppure se carica una delle librerie in heavy (grafica e Scikit-Learn, che devono essere importate
+    solo quando servono). Restituisce il tempo misurato.
+    """
+
+    elapsed, loaded = import_time(modules, heavy, repeat)
+
+    if loaded:
+        raise Exception("L'import di %s carica anche %s" % (', '.join(modules), ', '.join(loaded)))
+
+    if elapsed > budget:
+        raise Exception("L'import di %s richiede %.2fs (budget %.2fs)" % (', '.join(modules), elapsed, budget))
+
+    return elapsed
+
+
+#-----------------------------------------------------
+# Esecuzione da riga di comando
+#-----------------------------------------------------
+
+def main(args = None):
+
+    """python -m GeoSampling.Benchmark [--sizes ...] [--save file.json] [--compare file.json] [--imports]"""
+
+    parser = argparse.ArgumentParser(description = 'Benchmark di GeoSampling')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = [10, 100, 1000, 10000, 100000])
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--detail', type = float, default = 5)
+    parser.add_argument('--names', nargs = '+', default = None)
+    parser.add_argument('--save', default = None)
+    parser.add_argument('--compare', default = None)
+    parser.add_argument('--tolerance', type = float, default = 0.2)
+    parser.add_argument('--imports', action = 'store_true', help = 'controlla solo il tempo di import')
+    parser.add_argument('--budget', type = float, default = 1.0)
+    args = parser.parse_args(args)
+
+    if args.imports:
+        print('import', check_import_budget(args.budget))
+        return
+
+    results = run_benchmark(args.sizes, args.seed, args.repeat, args.names, args.detail, verbose = True)
+
+    if args.save is not None:
+        save_baseline(results, args.save)
+
+    if args.compare is not None:
+        print(compare(results, load_baseline(args.compare), args.tolerance).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,9 @@
 
 from GeoSampling import ObjFunZoom as objz
 
-from sklearn.cluster import DBSCAN
+# Scikit-Learn è importato dentro le funzioni: si carica solo se si usa il DBSCAN
+import pandas as pd
+import numpy as np
 import math
 
 #-------------------------------------------------------
@@ -20,6 +22,8 @@ def DBSCANmodel(dati, eps_meter = 10):
     già con 2 punti io voglio semplificare il poligono. 
     """
 
+    from sklearn.cluster import DBSCAN
+
     # Conversione da metri a gradi del valore di eps
     radius = 6371000
     eps = 360*eps_meter/(2*math.pi*radius)
@@ -33,6 +37,66 @@ def DBSCANmodel(dati, eps_meter = 10):
 
     return dati
 
+#-------------------------------------------------------------
+# DBSCAN per più valori di eps (un'unica struttura di vicini)
+#-------------------------------------------------------------
+
+def DBSCANsweep(dati, eps_meters):
+
+    """Label del DBSCAN per una lista di valori di eps
+    
+    Con min_samples = 2 ogni punto che ha almeno un vicino entro eps è un core point, quindi i cluster
+    del DBSCAN sono le componenti connesse del grafo delle coppie di punti a distanza minore o uguale
+    a eps, e i punti isolati sono 'noise point' (label -1).
+    Questa funzione calcola una volta sola le coppie di vicini entro l'eps più grande, ordinate per
+    distanza, e per ogni eps prende solo le coppie sotto la soglia e ne calcola le componenti connesse
+    (ObjFunZoom.cluster_labels). Le label sono numerate come quelle del DBSCAN di Scikit-Learn.
+    Restituisce un nuovo dataframe con lo stesso indice dei dati e una colonna per ogni eps (in metri);
+    i dati di partenza non vengono né copiati né modificati. Si usano solo le colonne 'Latitude' e 'Longitude'.
+    Se eps_meters è vuota, il dataframe non ha colonne.
+    """
+
+    eps_meters = list(eps_meters)
+    if len(eps_meters) == 0:
+        return pd.DataFrame(index = dati.index)
+
+    from sklearn.neighbors import NearestNeighbors
+
+    # Conversione da metri a gradi dei valori di eps
+    radius = 6371000
+    eps_list = [360*eps_meter/(2*math.pi*radius) for eps_meter in eps_meters]
+
+    points = np.column_stack((dati['Latitude'].to_numpy(), dati['Longitude'].to_numpy()))
+    n = len(points)
+
+    # Coppie di vicini entro l'eps più grande (i < j), ordinate per distanza
+    graph = NearestNeighbors(radius = max(eps_list)).fit(points).radius_neighbors_graph(mode = 'distance')
+    graph = graph.tocoo()
+    upper = graph.row < graph.col
+    first = graph.row[upper]
+    second = graph.col[upper]
+    distance = graph.data[upper]
+
+    order = np.argsort(distance, kind = 'stable')
+    first = first[order]
+    second = second[order]
+    distance = distance[order]
+
+    labels = {}
+
+    for eps_meter, eps in zip(eps_meters, eps_list):
+
+        # Coppie a distanza minore o uguale a eps
+        m = np.searchsorted(distance, eps, side = 'right')
+        components = objz.cluster_labels(n, first[:m], second[:m])
+
+        # I cluster di un solo punto sono noise point; gli altri sono rinumerati in ordine
+        counts = np.bincount(components, minlength = n)
+        new_label = np.cumsum(counts > 1) - 1
+        labels[eps_meter] = np.where(counts[components] > 1, new_label[components], -1)
+
+    return pd.DataFrame(labels, index = dati.index)
+
 #----------------------------------------------------------
 # Correzione alle label del DBSCAN
 #----------------------------------------------------------
@@ -5,6 +5,7 @@
 
 import pandas as pd
 import numpy as np
+import re
 
 #----------------------------------
 # Funzione di data preparation
@@ -46,6 +47,70 @@ def db_preparation(figures):
     return figures
 
 
+#-----------------------------------------------
+# Importazione a blocchi (streaming) del GML
+#-----------------------------------------------
+
+# Un token è una tag (ignorata) oppure una coppia di coordinate 'longitudine,latitudine';
+# un numero ha almeno una cifra (un '.' da solo non è un numero)
+GML_NUMBER = r'([-+]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][-+]?[0-9]+)?)'
+GML_TOKEN = re.compile(r'<[^>]*>|' + GML_NUMBER + ',' + GML_NUMBER)
+
+def parse_gml(geom):
+
+    """Coordinate di un poligono dal testo GML
+
+    A partire dal testo GML di un poligono (tag di GML, coordinate 'longitudine,latitudine' separate da
+    spazi, end tag), restituisce due array di float, latitudine e longitudine, con un'unica scansione del
+    testo: le tag vengono saltate e le coppie di coordinate vengono lette direttamente.
+    Se il testo manca (NaN o stringa vuota), il poligono è vuoto: i due array hanno lunghezza zero.
+    """
+
+    if not isinstance(geom, str):
+        geom = ''
+
+    values = [token.group(1, 2) for token in GML_TOKEN.finditer(geom) if token.group(1) is not None]
+    values = np.array(values, dtype = float).reshape(-1, 2)
+
+    return values[:, 1], values[:, 0]
+
+
+def db_stream(chunks):
+
+    """Importazione del database a blocchi (streaming)
+
+    Alternativa a db_preparation per database più grandi della memoria. chunks è una sequenza di dataframe
+    di Pandas (per esempio pd.read_csv(..., chunksize = 10000)) con la colonna ID_EXT, la colonna GEOM
+    in GML e le altre colonne del poligono. Per ogni blocco, restituisce (yield) una quaterna:
+    - attributes: il blocco senza la colonna GEOM, quindi una riga per poligono e non per punto;
+    - offsets: array di len(attributes)+1 interi, i punti del poligono k sono quelli da offsets[k] a offsets[k+1];
+    - lat, lon: array di float con le coordinate di tutti i punti del blocco, uno dopo l'altro.
+    Gli array di coordinate vengono allocati una volta sola per blocco (il numero di virgole nel GML è
+    un limite superiore al numero di punti) e riempiti poligono per poligono con parse_gml.
+    """
+
+    for chunk in chunks:
+
+        geoms = chunk['GEOM'].tolist()
+        capacity = int(chunk['GEOM'].str.count(',').sum())
+
+        lat = np.empty(capacity, dtype = float)
+        lon = np.empty(capacity, dtype = float)
+        offsets = np.zeros(len(geoms) + 1, dtype = np.int64)
+
+        pos = 0
+        for k, geom in enumerate(geoms):
+            polygon_lat, polygon_lon = parse_gml(geom)
+            lat[pos:pos + len(polygon_lat)] = polygon_lat
+            lon[pos:pos + len(polygon_lon)] = polygon_lon
+            pos = pos + len(polygon_lat)
+            offsets[k + 1] = pos
+
+        attributes = chunk.drop(labels = ['GEOM'], axis = 1)
+
+        yield attributes, offsets, lat[:pos], lon[:pos]
+
+
 #--------------------------------------
 # Funzione di anonimizzazione dei dati
 #--------------------------------------
@@ -0,0 +1,229 @@
+#************************************************************************************
+# Questo file contiene gli strumenti per misurare gli step del sampling:
+# i record di ogni step e i sink che li raccolgono
+#************************************************************************************
+
+import json
+import time
+import tracemalloc
+import pandas as pd
+
+#-----------------------------------------------------
+# Misura di uno step
+#-----------------------------------------------------
+
+class StageMeter:
+
+    """Misura di uno step del sampling
+
+    Usata da Sampling.run_stages quando ci sono degli hooks: start prima dello step, stop dopo lo step.
+    stop restituisce il record dello step, un dizionario con le chiavi:
+    polygon (identificativo del poligono, se noto), stage (nome dello step), title, params (parametri
+    effettivi), points_in e points_out (punti prima e dopo lo step), wall_time e cpu_time (in secondi),
+    peak_memory (picco di memoria allocata durante lo step, in byte, oppure None) e fallback (True se
+    lo step ha lasciato meno di minPoints punti ed è stato ignorato).
+    Il picco di memoria è misurato con tracemalloc solo se memory = True: tracemalloc rallenta molto
+    l'esecuzione (anche di 20 volte), quindi in questo caso i tempi NON sono attendibili, e conviene
+    misurare i tempi e la memoria in due esecuzioni separate.
+    """
+
+    def __init__(self, memory = False):
+
+        # tracemalloc viene fermato alla fine solo se è stato avviato qui
+        self.trace_memory = memory
+        self.started_tracing = memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+
+    def start(self):
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def stop(self, stage, points_in, points_out, fallback, polygon = None):
+
+        wall_time = time.perf_counter() - self.wall
+        cpu_time = time.process_time() - self.cpu
+        peak_memory = None
+        if self.trace_memory:
+            peak_memory = max(tracemalloc.get_traced_memory()[1] - self.memory, 0)
+
+        name, title, function, params, dependent = stage
+
+        return {'polygon': polygon, 'stage': name, 'title': title, 'params': dict(params),
+                'points_in': points_in, 'points_out': points_out,
+                'wall_time': wall_time, 'cpu_time': cpu_time, 'peak_memory': peak_memory,
+                'fallback': fallback}
+
+    def close(self):
+
+        if self.started_tracing:
+            tracemalloc.stop()
+
+
+def emit(hooks, record):
+
+    """Manda un record a tutti gli hooks (funzioni o oggetti con un metodo __call__)."""
+
+    for hook in hooks:
+        hook(record)
+
+
+#-----------------------------------------------------
+# Sink: raccolta in memoria
+#-----------------------------------------------------
+
+class RecordCollector:
+
+    """Raccoglie in memoria tutti i record ricevuti."""
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def to_frame(self):
+
+        """Dataframe con un record per riga."""
+
+        return pd.DataFrame(self.records)
+
+    def summary(self):
+
+        """Riepilogo per step dei record raccolti (vedi StageSummary)."""
+
+        return StageSummary.from_records(self.records).to_frame()
+
+
+#-----------------------------------------------------
+# Sink: file JSON lines
+#-----------------------------------------------------
+
+class JsonLinesWriter:
+
+    """Scrive ogni record come una riga JSON nel file path (in coda, se il file esiste già)
+
+    Il file viene aperto alla prima scrittura e ogni riga viene scritta subito: il writer può essere
+    passato ai processi di BatchSampling, che scrivono tutti in coda allo stesso file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __call__(self, record):
+
+        if self.file is None:
+            self.file = open(self.path, 'a', buffering = 1)
+
+        self.file.write(json.dumps(record, default = str) + '\n')
+
+    def close(self):
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'file': None}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_records(path):
+
+    """Legge i record scritti da JsonLinesWriter nel file path."""
+
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def max_memory(a, b):
+
+    """Massimo tra due picchi di memoria, ignorando quelli non misurati (None)."""
+
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+#-----------------------------------------------------
+# Sink: riepilogo su tutto un batch
+#-----------------------------------------------------
+
+class StageSummary:
+
+    """Riepilogo dei record per step, senza tenerli in memoria
+
+    Per ogni step (nome) conta le esecuzioni, i punti in ingresso e in uscita, i tempi totali, il picco
+    di memoria massimo (None se la memoria non è stata misurata) e il numero di fallback. Due riepiloghi
+    si possono unire con merge (per esempio uno per ogni processo), e si può costruire un riepilogo dai
+    record letti da un file JSON lines (from_records(read_records(path))).
+    """
+
+    fields = ['count', 'points_in', 'points_out', 'wall_time', 'cpu_time', 'fallbacks']
+
+    def __init__(self):
+        self.stages = {}
+
+    def new_totals(self):
+
+        totals = dict.fromkeys(self.fields, 0)
+        totals['peak_memory'] = None
+        return totals
+
+    def __call__(self, record):
+
+        totals = self.stages.setdefault(record['stage'], self.new_totals())
+
+        totals['count'] = totals['count'] + 1
+        totals['points_in'] = totals['points_in'] + record['points_in']
+        totals['points_out'] = totals['points_out'] + record['points_out']
+        totals['wall_time'] = totals['wall_time'] + record['wall_time']
+        totals['cpu_time'] = totals['cpu_time'] + record['cpu_time']
+        totals['fallbacks'] = totals['fallbacks'] + int(record['fallback'])
+        totals['peak_memory'] = max_memory(totals['peak_memory'], record['peak_memory'])
+
+    @classmethod
+    def from_records(cls, records):
+
+        """Riepilogo di una lista di record."""
+
+        summary = cls()
+        for record in records:
+            summary(record)
+
+        return summary
+
+    def merge(self, other):
+
+        """Unisce a questo riepilogo un altro riepilogo."""
+
+        for stage, other_totals in other.stages.items():
+            totals = self.stages.setdefault(stage, self.new_totals())
+            for field in self.fields:
+                totals[field] = totals[field] + other_totals[field]
+            totals['peak_memory'] = max_memory(totals['peak_memory'], other_totals['peak_memory'])
+
+        return self
+
+    def to_frame(self):
+
+        """Dataframe con una riga per step, ordinato per tempo totale decrescente."""
+
+        summary = pd.DataFrame.from_dict(self.stages, orient = 'index',
+                                         columns = self.fields + ['peak_memory'])
+        summary.index.name = 'stage'
+        summary['wall_share'] = summary['wall_time']/summary['wall_time'].sum()
+
+        return summary.sort_values('wall_time', ascending = False)
@@ -4,9 +4,7 @@
 
 import numpy as np
 import pandas as pd
-from numpy.linalg import norm
 import math
-from shapely.geometry import Polygon
 
 from GeoSampling import Periodics as pc
 
@@ -16,19 +14,169 @@ from GeoSampling import Periodics as pc
 
 def PolyArea(dati):
 
-    """Calcola l'area di un poligono"""
+    """Calcola l'area di un poligono (dataframe oppure vista di un PolygonStore)"""
 
-    x = list(dati['Latitude'])
-    y = list(dati['Longitude'])
-    pgon = Polygon(zip(x, y))
-    Area = pgon.area
+    dati = pc.as_frame(dati)
+    x = dati['Latitude'].to_numpy()
+    y = dati['Longitude'].to_numpy()
+    Area = ring_areas(x, y, [0])[0]
 
     return Area
 
+#---------------------------------------------------------
+# AREE DI TANTI POLIGONI INSIEME (formula di Gauss)
+#---------------------------------------------------------
+
+def ring_areas(x, y, first):
+
+    """Aree di tanti poligoni memorizzati uno dopo l'altro
+
+    x e y contengono i vertici di tutti i poligoni, uno dopo l'altro (senza ripetere il primo vertice
+    alla fine), e first contiene la posizione del primo vertice di ogni poligono. Le aree (in valore
+    assoluto) sono calcolate tutte insieme con la formula di Gauss (shoelace): i vertici di ogni poligono
+    sono traslati rispetto al suo primo vertice, per non perdere precisione, e le somme dei prodotti
+    vettoriali dei lati sono fatte per gruppi con np.add.reduceat.
+    """
+
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    first = np.asarray(first)
+
+    if len(first) == 0:
+        return np.zeros(0)
+
+    # Traslazione rispetto al primo vertice di ogni poligono
+    counts = np.diff(np.append(first, len(x)))
+    ring = np.repeat(np.arange(len(first)), counts)
+    x = x - x[first][ring]
+    y = y - y[first][ring]
+
+    # Prodotti vettoriali dei lati consecutivi; il lato di chiusura (verso il primo vertice,
+    # che è nell'origine) vale zero, così come il "lato" tra due poligoni diversi
+    cross = np.zeros(len(x))
+    cross[:-1] = x[:-1]*y[1:] - x[1:]*y[:-1]
+    cross[np.append(first[1:], len(x)) - 1] = 0
+
+    return np.abs(np.add.reduceat(cross, first))/2
+
+
+#---------------------------------------------------------
+# Dati originali con condizioni periodiche (come array)
+#---------------------------------------------------------
+
+def periodic_coords(orig):
+
+    """Coordinate di orig con condizioni periodiche
+
+    Dato il poligono originale (orig, non resettato), restituisce latitudine e longitudine di orig con
+    condizioni periodiche, come array, e l'indice delle etichette corrispondenti (-1, 0, ..., N+1).
+    Come pc.PC(orig) usato finora dalle metriche: orig non è resettato, quindi la riga -1 è la riga N
+    (uguale alla riga 0) e la riga N+1 è la riga 0.
+    """
+
+    orig = pc.as_frame(orig)
+    lat, lon = pc.Ring.from_frame(orig).periodic()
+    labels = pd.Index(np.concatenate(([-1], orig.index.to_numpy(), [max(orig.index) + 1])))
+
+    return lat, lon, labels
+
+
+def run_vertices(lost, starts, ends, labels):
+
+    """Vertici dei poligoni formati dai gruppi di punti tolti
+
+    A partire dai gruppi di punti tolti (lost_runs) e dall'indice delle etichette dei dati periodici
+    (periodic_coords), restituisce le posizioni (nei dati periodici) dei vertici di tutti i poligoni,
+    uno dopo l'altro: per ogni gruppo, il punto prima (A), i punti tolti e il punto dopo (B).
+    Restituisce anche la posizione di A e di B di ogni gruppo in questo array.
+    """
+
+    runs = np.arange(len(starts))
+    first = starts + 2*runs
+    last = ends + 2*runs + 1
+
+    # Punto prima e punto dopo ogni gruppo
+    lowlimit = np.minimum.reduceat(lost, starts) - 1
+    uplimit = np.maximum.reduceat(lost, starts) + 1
+
+    verts = np.empty(len(lost) + 2*len(starts), dtype = int)
+    verts[first] = labels.get_indexer(lowlimit)
+    verts[last] = labels.get_indexer(uplimit)
+    verts[np.arange(len(lost)) + 2*np.repeat(runs, ends - starts) + 1] = labels.get_indexer(lost)
+
+    return verts, first, last
+
+
+def lost_distances(lat, lon, labels, lost, starts, ends, vertices):
+
+    """Distanza (in metri) di ogni punto tolto dalla base del suo gruppo
+
+    A partire dai dati periodici (periodic_coords), dai gruppi di punti tolti (lost_runs) e dai vertici
+    dei loro poligoni (vertices, restituito da run_vertices), associa ogni punto tolto al punto prima (A)
+    e al punto dopo (B) del suo gruppo e calcola tutte le distanze punto-retta insieme.
+    Se A e B coincidono, la distanza è quella dal punto A.
+    """
+
+    verts, first, last = vertices
+
+    run = np.repeat(np.arange(len(starts)), ends - starts)
+    baseA = verts[first][run]
+    baseB = verts[last][run]
+    points = labels.get_indexer(lost)
+
+    # Base del poligono (vettore AB) e vettore AP per ogni punto tolto
+    base_lat = lat[baseB] - lat[baseA]
+    base_lon = lon[baseB] - lon[baseA]
+    point_lat = lat[points] - lat[baseA]
+    point_lon = lon[points] - lon[baseA]
+
+    # Distanze tra ogni punto e la base (se A e B coincidono, distanza dal punto A)
+    base_norm = np.hypot(base_lat, base_lon)
+    cross = np.abs(base_lat*point_lon - base_lon*point_lat)
+    distances = np.where(base_norm > 0,
+                         cross/np.where(base_norm > 0, base_norm, 1),
+                         np.hypot(point_lat, point_lon))
+
+    # Conversione in metri
+    radius = 6371000
+    distances_meter = (2*math.pi*radius)*distances/360
+
+    return distances_meter
+
+
 #------------------------------------------------------
 # Gruppi di punti tolti consecutivi
 #------------------------------------------------------
 
+def lost_runs(orig, sampled):
+
+    """Gruppi di punti tolti consecutivi (come array)
+
+    Dato il poligono originale (orig, non resettato) e quello ottenuto a seguito del sampling (sampled),
+    restituisce tre array: lost, con le etichette dei punti tolti (nell'ordine di orig), e starts, ends,
+    con l'inizio e la fine (esclusa) di ogni gruppo di punti tolti consecutivi in lost: il gruppo k è
+    lost[starts[k]:ends[k]]. I punti tolti si trovano con una maschera (np.isin) in tempo lineare.
+    In tutte le metriche, orig può essere un dataframe oppure una vista (PolygonView) di un PolygonStore.
+    """
+
+    # Reset dei punti originali
+    orig = pc.reset_data(pc.as_frame(orig))
+
+    # Punti mancanti
+    allpoints = orig.index.to_numpy()
+    lost = allpoints[~np.isin(allpoints, sampled.index.to_numpy())]
+
+    if len(lost) == 0:
+        return lost, np.array([], dtype = int), np.array([], dtype = int)
+
+    # Un nuovo gruppo inizia quando la differenza con il punto tolto precedente è maggiore di 1
+    breaks = np.flatnonzero(np.diff(lost) > 1) + 1
+    starts = np.insert(breaks, 0, 0)
+    ends = np.append(breaks, len(lost))
+
+    return lost, starts, ends
+
+
 def diffPoints(orig, sampled):
 
     """Gruppi di punti tolti consecutivi
@@ -37,32 +185,24 @@ def diffPoints(orig, sampled):
     a seguito del sampling (sampled), questa funzione mi calcola un dataframe che contiene
     i gruppi di punti tolti consecutivi, basandosi sul fatto che tutti i punti di sampled
     stanno in orig, e in orig ci sono dei punti in più.
+    Le metriche usano direttamente lost_runs, che restituisce gli stessi gruppi come array.
     """
-    
-    # Reset dei punti originali
-    orig = pc.reset_data(orig)
 
-    # Punti mancanti
-    allpoints = list(orig.index.values)
-    remaining = list(sampled.index.values)
-    lostpoints = np.array([item for item in allpoints if item not in remaining])
+    lostpoints, starts, ends = lost_runs(orig, sampled)
 
     if len(lostpoints) == 0:
         df = pd.DataFrame(columns=['LostPoints','Difference','id_period'])
         return df
 
-    # Identifico i gruppi di punti consecutivi tramite due passaggi:
-    # - Prima faccio le differenze tra [i] e [i+1]; (diffpoints)
-    # - In base alle differenze, assegno un id consecutivo identico per tutti i gruppi di punti.
-
+    # Differenze tra [i] e [i+1], e id consecutivo identico per tutti i punti di un gruppo
     diffpoints = np.insert(np.diff(lostpoints), 0, 0)
+    id_period = np.repeat(np.arange(1, len(starts)+1), ends - starts)
 
     df = pd.DataFrame({
-        'LostPoints': pd.Series(lostpoints),
-        'Difference': pd.Series(diffpoints)
+        'LostPoints': lostpoints,
+        'Difference': diffpoints,
+        'id_period': id_period
     })
-
-    df['id_period'] = pd.Series(1 + np.cumsum(df['Difference'] > 1))
     
     return df
 
@@ -86,38 +226,23 @@ def diffAbsArea(orig, sampled):
     un altro di area circa identica, l'area è circa la stessa.
     """
 
-    # Dataframe dei poligoni dei punti consecutivi
-    df = diffPoints(orig, sampled)
+    # Gruppi di punti tolti consecutivi
+    orig = pc.as_frame(orig)
+    lost, starts, ends = lost_runs(orig, sampled)
 
     # Bisogna aver tolto qualche punto! Altrimenti, la differenza di area è 0.
-    if len(df) == 0:
+    if len(lost) == 0:
         return 0
 
     # Per ognuno dei gruppi di punti consecutivi:
     # - Aggiungo *il punto prima* e *il punto dopo*;
-    # - Calcolo l'area formata da questo insieme di punti.
+    # - Calcolo l'area formata da questo insieme di punti (tutti i gruppi insieme, vedi ring_areas).
     # - La aggiungo al totale.
 
-    totalArea = 0
-    orig = pc.PC(orig) #Condizioni al contorno periodiche (per prendere lowlimit e uplimit)
-
-    # Per ogni gruppo di punti non consecutivi:
-    for i in range(1, df['id_period'].max()+1):
-
-        # Prendo gli indici del punto prima e del punto dopo
-        lowlimit = df[df['id_period'] == i]['LostPoints'].min() - 1 #Indice del punto prima
-        uplimit = df[df['id_period'] == i]['LostPoints'].max() + 1 #Indice del punto dopo
+    lat, lon, labels = periodic_coords(orig)
+    verts, first, last = run_vertices(lost, starts, ends, labels)
 
-        # Considero la lista di indici
-        indexes = list(df[df['id_period'] == i]['LostPoints']) #Elenco di indici
-        indexes = np.insert(indexes, 0, lowlimit) #Inserisci lowlimit prima della posizione 0
-        indexes = np.append(indexes, uplimit) #Inserisci uplimit alla fine.
-        indexes = list(indexes)
-
-        # Calcolo l'area
-        resetted = orig.loc[indexes]
-        Area = abs(PolyArea(resetted))
-        totalArea = abs(totalArea) + abs(Area)
+    totalArea = ring_areas(lat[verts], lon[verts], first).sum()
 
     return totalArea
 
@@ -153,66 +278,41 @@ def diffArea(orig, sampled):
 # https://www.nagwa.com/en/explainers/939127418581/
 #---------------------------------------------------
 
-def maxDistance(orig, sampled):
+def maxDistance(orig, sampled, details = False):
 
     """Scarto massimo tra orig e sampled.
 
     Dato il poligono originale (orig, formato input) e il poligono campionato (sampled, senza periodiche),
     entrambi nel formato di Pandas con una colonna che si chiama 'Latitude' e una che si chiama 'Longitude', 
     calcolo lo scarto massimo tra i due, considerando anche in questo caso scarti sempre positivi.
+    Le distanze di tutti i punti tolti sono calcolate insieme, con un'unica espressione sugli array.
+    Se details = True, restituisce anche lo scarto massimo di ogni gruppo di punti tolti consecutivi
+    (in metri) e l'etichetta del punto con lo scarto massimo.
     """
 
-    # Dataframe dei poligoni dei punti consecutivi
-    df = diffPoints(orig, sampled)
+    # Gruppi di punti tolti consecutivi
+    orig = pc.as_frame(orig)
+    lost, starts, ends = lost_runs(orig, sampled)
 
     # Bisogna aver tolto qualche punto! 
     # Altrimenti, lo scarto massimo è zero
-    if len(df) == 0:
-        return 0
+    if len(lost) == 0:
+        return (0, np.zeros(0), None) if details else 0
 
     # Per ognuno dei gruppi di punti consecutivi:
-    # - Aggiungo il punto prima del primo (A) e il punto dopo l'ultimo (B);
-    # - Considero il vettore AB
-    # - Calcolo la distanza tra ogni punto sottratto e il vettore AB (distanza punto-retta)
-    # - Prendo il massimo
-    # - Prendo il massimo di ogni ciclo
-
-    totalmax = 0
-    orig = pc.PC(orig) #Condizioni al contorno periodiche (per prendere lowlimit e uplimit)
-
-    for i in range(1, df['id_period'].max()+1):
-
-        # Punto prima e punto dopo
-        lowlimit = df[df['id_period'] == i]['LostPoints'].min() - 1
-        uplimit = df[df['id_period'] == i]['LostPoints'].max() + 1
-
-        # Lista di punti
-        indexes = list(df[df['id_period'] == i]['LostPoints'])
-        indexes = np.insert(indexes, 0, lowlimit) #Inserisci lowlimit prima della posizione 0
-        indexes = np.append(indexes, uplimit) #Inserisci uplimit alla fine.
-        indexes = list(indexes)
-
-        # Poligono con quei punti
-        pol = orig.loc[indexes]
-
-        # Base del poligono (vettore AB)
-        baseA = pol.iloc[0].to_numpy()
-        baseB = pol.iloc[len(pol)-1].to_numpy()
-        base = baseB - baseA
-
-        # Punti eliminati
-        points = pol.iloc[1:len(pol)-1].to_numpy()
+    # - Considero il punto prima del primo (A) e il punto dopo l'ultimo (B), e il vettore AB;
+    # - Calcolo la distanza tra ogni punto sottratto e il vettore AB (distanza punto-retta).
+    # Tutti i punti tolti sono considerati insieme: ogni punto è associato ad A e B del suo gruppo.
 
-        # Distanze tra ogni punto e la base
-        distances = np.abs(np.cross(base, points-baseA)/norm(base))
+    lat, lon, labels = periodic_coords(orig)
+    vertices = run_vertices(lost, starts, ends, labels)
+    distances_meter = lost_distances(lat, lon, labels, lost, starts, ends, vertices)
+    totalmax_meter = distances_meter.max()
 
-        # Prendo il massimo
-        localmax = distances.max() # Massimo locale nel vettore delle distanze
-        totalmax = max(localmax, totalmax) # Massimo globale nel ciclo
-
-    # Conversione in metri
-    radius = 6371000
-    totalmax_meter = (2*math.pi*radius)*totalmax/360
+    if details:
+        runmax_meter = np.maximum.reduceat(distances_meter, starts)
+        worst = lost[np.argmax(distances_meter)]
+        return totalmax_meter, runmax_meter, worst
 
     return totalmax_meter
 
@@ -228,4 +328,74 @@ def relativeDistance(orig, sampled, detail):
     scarto = maxDistance(orig, sampled) #Dettaglio massimo
     relative = scarto/detail
 
-    return relative
\ No newline at end of file
+    return relative
+
+
+#------------------------------------------------
+# Report di qualità (tutte le metriche insieme)
+#------------------------------------------------
+
+def quality_report(orig, sampled, detail):
+
+    """Tutte le metriche di qualità di un sampling, calcolate insieme
+
+    Dato il poligono originale (orig, formato input), il poligono campionato (sampled) e il dettaglio,
+    calcola una volta sola i gruppi di punti tolti, i dati periodici e i vertici dei poligoni dei gruppi,
+    e restituisce un dizionario con:
+    - diffArea: differenza di area relativa (come diffArea);
+    - diffAbsArea: differenza di area assoluta, in gradi al quadrato (come diffAbsArea);
+    - maxDistance: scarto massimo in metri (come maxDistance);
+    - relativeDistance: scarto massimo relativo al dettaglio (come relativeDistance);
+    - reduction: frazione dei punti (distinti) di orig che sono stati tolti.
+    """
+
+    orig = pc.as_frame(orig)
+    lost, starts, ends = lost_runs(orig, sampled)
+    lat, lon, labels = periodic_coords(orig)
+
+    # Area di orig (le righe di orig sono i dati periodici senza la prima e l'ultima)
+    orig_area = ring_areas(lat[1:-1], lon[1:-1], [0])[0]
+
+    if len(lost) == 0:
+        diff_area = 0
+        scarto = 0
+    else:
+        vertices = run_vertices(lost, starts, ends, labels)
+        diff_area = ring_areas(lat[vertices[0]], lon[vertices[0]], vertices[1]).sum()
+        scarto = lost_distances(lat, lon, labels, lost, starts, ends, vertices).max()
+
+    return {
+        'diffArea': diff_area/orig_area,
+        'diffAbsArea': diff_area,
+        'maxDistance': scarto,
+        'relativeDistance': scarto/detail,
+        'reduction': len(lost)/(len(orig) - 1)
+    }
+
+
+def quality_table(pairs, detail):
+
+    """Report di qualità per tanti sampling
+
+    pairs è una lista di coppie (orig, sampled), oppure un dizionario {chiave: (orig, sampled)};
+    detail è un numero, oppure una lista (o un dizionario) con un dettaglio per ogni coppia.
+    Restituisce un dataframe con una riga per coppia (indicizzato dalle chiavi, se pairs è un dizionario)
+    e una colonna per ogni metrica di quality_report.
+    """
+
+    if isinstance(pairs, dict):
+        keys = list(pairs.keys())
+        pairs = list(pairs.values())
+        if isinstance(detail, dict):
+            detail = [detail[key] for key in keys]
+    else:
+        pairs = list(pairs)
+        keys = range(len(pairs))
+
+    if np.ndim(detail) == 0:
+        detail = [detail]*len(pairs)
+
+    rows = [quality_report(orig, sampled, d) for (orig, sampled), d in zip(pairs, detail)]
+
+    return pd.DataFrame(rows, index = keys, columns = ['diffArea', 'diffAbsArea', 'maxDistance',
+                                                       'relativeDistance', 'reduction'])
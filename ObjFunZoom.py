@@ -3,11 +3,10 @@
 #*************************************************************************
 
 import pandas as pd
-import itertools
+import numpy as np
 from shapely.geometry import Point
+from shapely.strtree import STRtree
 import math
-import copy
-from collections import OrderedDict
 
 #-------------------------------------------------
 # Dataframe df_points con buffer per ogni punto
@@ -65,207 +64,172 @@ def dataset_groups(lista):
     Quindi l'intersezione tra 2 e 3 è inserita nel primo set e non nel secondo. 
     """
     
-    #---------------
-    # Trova tutte le intersezioni di ogni punto con ogni altro punto (a lui successivo)
-    # e mettile nel dataframe 'df'.
-    # Non ci sono ripetizioni. ES: (a, b), (a, c), (a, d), (b, c), (b, d), (c, d)
-    #---------------
-    
-    df = pd.DataFrame(columns=['Name_A', 'Buffer A', 'Name_B', 'Buffer B','Intersect'])
-
-    for subset in itertools.combinations(lista, 2):
-        
-        # subset è una tupla che contiene la combinazione
-        # Quindi è una tupla di tuple
-        # subset[0] contiene il primo elemento della combinazione, mentre
-        # subset[1] contiene il secondo elemento della combinazione.
-        # subset[0][0] contiene il primo elemento della tupla (quindi l'indice)
-        # subset[0][1] contiene il secondo elemento della tupla (quindi il poligono)
-        
-        # Check intersection
-        first = subset[0][1]
-        second = subset[1][1]
-        intersect = first.intersects(second)
-
-        # Ottieni il nome
-        name_first = subset[0][0]
-        name_second = subset[1][0]
-
-        # Add rows to dataframe
-        add_row = pd.DataFrame([[name_first, first, name_second, second, intersect]],
-                               columns = ['Name_A', "Buffer A", 'Name_B', "Buffer B", "Intersect"])
+    # Coppie di poligoni che si intersecano (posizioni nella lista, la prima precede la seconda)
+    first, second = intersection_edges(lista)
 
-        df = pd.concat([df, add_row], ignore_index = True)
-    
-    #------------------------------------
-    # Operazioni sul dataframe df
-    # perché sia più utilizzabile
-    #------------------------------------
-    
-    df = df.sort_values(by = ['Name_A', 'Name_B'], ascending = True) #Metti in ordine per nome di punto
-    df = df[df['Intersect'] == True] #Intersezioni vere
-    
     #------------------------------------
     # Ottieni il dataset GROUPS
     #------------------------------------
-    
-    # Per le intersezioni
-    groups = df.groupby('Name_A')['Name_B'].apply(set).reset_index(name='Points')
-    
-    # Aggiungi gli elementi che non si intersecano con niente
-    # Inserendo una riga che contiene l'elemento e un set vuoto
-    
-    s1 = set([i[0] for i in lista]) #Tutti gli elementi
-    s2 = set(groups['Name_A'].unique()) #Elementi in groups
 
-    for element in s1.difference(s2):
-        row = pd.DataFrame([[element, set()]],
-                           columns = ['Name_A', "Points"])
-        groups = pd.concat([groups, row])
-        
-    groups = groups.sort_values('Name_A').reset_index()[['Name_A', 'Points']]
+    # Per ogni poligono, l'insieme dei poligoni successivi che lo intersecano
+    # Gli elementi che non si intersecano con niente hanno un set vuoto
+    names = [i[0] for i in lista]
+    points = [set() for i in lista]
+
+    for a, b in zip(first.tolist(), second.tolist()):
+        points[a].add(names[b])
+
+    groups = pd.DataFrame({'Name_A': names, 'Points': points})
+    groups = groups.sort_values('Name_A').reset_index(drop = True)
         
     return groups
 
 
-#---------------------------------------------------------------------------------
-# Elenco dei cluster dal dataset groups
-#---------------------------------------------------------------------------------
+#-----------------------------------------------------------------------------------
+# Elenco delle intersezioni tramite indice spaziale
+#-----------------------------------------------------------------------------------
 
-def find_clusters(groups):
+def intersection_edges(lista):
 
-    """Elenco di clusters, a partire dal dataset groups (prima parte)
+    """Elenco delle coppie di poligoni che si intersecano (lista di archi).
 
-    A partire da un dataset di punti "ordinati" che per ogni punto mi elenca le intersezioni con i punti
-    successivi, determino i cluster di punti che si intersecano, in modo tale che i punti A e B fanno parte 
-    dello stesso cluster se A si interseca con B, oppure se A si interseca con C che si interseca con B, 
-    oppure se A si interseca con C che si interseca con D che si interseca con B, e via così 
-    (con tutti i livelli possibili).
+    Data una lista di poligoni "ordinati", ciascuno etichettato da un nome, restituisce due array con le
+    posizioni nella lista delle coppie che si intersecano, senza ripetizioni e con la prima posizione
+    sempre minore della seconda (come in itertools.combinations). Le coppie candidate si ottengono
+    da un indice spaziale (STRtree di Shapely) e poi vengono verificate con 'intersects',
+    invece di confrontare tutte le N(N-1)/2 coppie.
     """
-    
-    clusters = [] # Conterrà i clusters
-    index_p = 0 # L'indice scorre sulle righe di groups
-    
-    while index_p < len(groups):
-
-        my_set = set()
 
-        # Prendo il punto e punti che lo intersecano
-        point = groups.iloc[index_p]['Name_A']
-        my_set = groups.loc[index_p]['Points']
+    geoms = [i[1] for i in lista]
 
-        if(len(my_set) == 0): # Il punto non si interseca con niente
+    if len(geoms) == 0:
+        return np.array([], dtype = int), np.array([], dtype = int)
 
-            # Il cluster deve contenere solo il punto 
-            my_set = my_set.union({point})
-            clusters.append(my_set)
+    tree = STRtree(geoms)
+    first, second = tree.query(geoms, predicate = 'intersects')
 
-        else: # Il punto si interseca con qualcosa
+    # Ogni coppia compare due volte (e ogni poligono interseca se stesso): tengo solo a < b
+    later = first < second
+    first = first[later]
+    second = second[later]
 
-            # Il cluster deve contenere tutti i punti con cui si interseca
-            # e anche tutti i punti con cui si intersecano quei punti
+    order = np.lexsort((second, first))
 
-            previous_set = 0
-            while(previous_set != my_set):
+    return first[order], second[order]
 
-                # Salvo il set precedente
-                previous_set = my_set
 
-                # Aggiorno il nuovo set:
-                # Per ogni elemento, ci aggiungo tutti gli elementi che si intersecano con lui
-                for elem in my_set:
-                    sets = groups[groups['Name_A'] == elem].iat[0,1]
-                    my_set = my_set.union(sets)
+#---------------------------------------------------------------------------------
+# Cluster dalle intersezioni (union-find)
+#---------------------------------------------------------------------------------
 
-            my_set = my_set.union({point})
-            clusters.append(my_set)
+def cluster_labels(n, first, second):
 
-        index_p = index_p + 1
-        
-    return clusters
+    """Etichette dei cluster a partire dalla lista di archi.
 
+    Dati n punti (posizioni 0...n-1) e le coppie di punti che si intersecano (due array di posizioni,
+    come restituiti da intersection_edges), i punti A e B fanno parte dello stesso cluster se A si
+    interseca con B, oppure se A si interseca con C che si interseca con B, e via così: i cluster sono
+    le componenti connesse del grafo delle intersezioni.
+    Le componenti si trovano con una struttura union-find (con compressione dei cammini), in un unico
+    passaggio sugli archi. Le etichette sono numerate da 0 nell'ordine del primo punto di ogni cluster.
+    """
 
-def find_real_clusters(lista_clusters):
+    parent = list(range(n))
 
-    """Elenco di clusters (seconda parte, correzione della funzione precedente)
-    
-    La funzione find_clusters restituisce una lista di insiemi, e ogni insieme è presente nella lista
-    con anche alcuni suoi sottoinsiemi. Quindi, se per esempio è presente l'insieme A = {1, 2, 4}, ci sarà
-    anche l'insieme B = {2, 4} e l'insieme B = {4}. Di conseguenza, voglio eliminare gli eventuali 
-    sovrainsiemi che trovo con questa funzione che li elimina tutti.
-    """
+    def find(i):
 
-    # Nuova lista di clusters
-    new_lista_clusters = []
+        # Radice del punto i
+        root = i
+        while parent[root] != root:
+            root = parent[root]
 
-    for elem in lista_clusters:
-    
-        lista = copy.deepcopy(lista_clusters)
-        lista.remove(elem) #Ottengo una copia della lista di partenza ma senza questo elemento
+        # Compressione del cammino
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
 
-        # Voglio controllare per tutti gli elementi della lista
-        # se non ci sono 'sovrainsiemi': cioè, l'elemento che prendo è il cluster
-        # a meno che non sia il sottoinsieme di un insieme esistente
-        # allora in questo caso diventa lui l'insieme.
+        return root
 
-        new_cluster = elem
+    for a, b in zip(np.asarray(first).tolist(), np.asarray(second).tolist()):
 
-        for insieme in lista:
-            if elem.issubset(insieme) and len(insieme) > len(new_cluster):
-                new_cluster = insieme
+        root_a = find(a)
+        root_b = find(b)
 
-        new_lista_clusters.append(new_cluster)
+        # La radice è sempre il punto con la posizione più piccola
+        if root_a < root_b:
+            parent[root_b] = root_a
+        elif root_b < root_a:
+            parent[root_a] = root_b
 
-    # A questo punto, ogni cluster è stato sostituito con il suo sovrainsieme
-    # Utilizzo questa espressione per rimuovere i duplicati e ottenere una lista di clusters pulita
-    new_lista_clusters = [set(i) for i in OrderedDict.fromkeys(frozenset(item) for item in new_lista_clusters)]
+    roots = np.array([find(i) for i in range(n)], dtype = int)
+    _, labels = np.unique(roots, return_inverse = True)
 
-    return new_lista_clusters
+    return labels
 
 
 #--------------------------------------------------
 # Add labels
 #--------------------------------------------------
 
-def add_labels(df_points, clusters):
+def add_labels(df_points, labels):
 
     """Aggiungi le etichette ai punti
 
-    Dato il dataframe di punti (df_points) e la lista di cluster (clusters) ottenuta da find_clusters, 
-    la funzione assegna a ogni punto il cluster a cui appartiene.
+    Dato il dataframe di punti (df_points) e l'array di etichette (labels) ottenuto da cluster_labels,
+    nello stesso ordine dei punti, la funzione assegna a ogni punto il cluster a cui appartiene.
     """
-    
-    # Dataframe 'LABELS': per ogni nome di punto, la sua label
-    labels = pd.DataFrame(clusters)
-    labels.insert(0, 'Label', range(0, 0 + len(labels)))
-    labels = labels.melt(id_vars = ['Label'], var_name = 'set', value_name = 'Point_Name').dropna().sort_values(by='Point_Name')[['Point_Name', 'Label']]
-    
-    points_with_labels = df_points.merge(labels, on = 'Point_Name')
+
+    points_with_labels = df_points.copy()
+    points_with_labels['Label'] = labels
+
     return points_with_labels
 
 
-def add_centroids(points_with_labels):
+def representatives(labels, lat, lon):
 
-    """Dati i punti con la loro label, restituisci il centroide"""
+    """Posizioni dei punti più vicini al centroide del proprio cluster.
 
-    # Centroidi dei cluster e merge con i punti originali
-    new_points = points_with_labels.groupby('Label').mean().reset_index()[['Label', 'Latitude', 'Longitude']]
-    new_points = new_points.rename({'Latitude': 'Latitude_mean', 'Longitude': 'Longitude_mean'}, axis = 1)
-    points_with_labels = points_with_labels.merge(new_points, on = 'Label')
+    Dati gli array delle etichette, della latitudine e della longitudine, calcola il centroide di ogni
+    cluster (con una sola riduzione in stile bincount), la distanza di ogni punto dal centroide del suo
+    cluster e, per ogni cluster, la posizione del punto più vicino. A parità di distanza vince il punto
+    che viene prima. Le posizioni restituite sono in ordine crescente.
+    """
+
+    lat = np.asarray(lat, dtype = float)
+    lon = np.asarray(lon, dtype = float)
+
+    if len(lat) == 0:
+        return np.array([], dtype = int)
+
+    # Etichette rinumerate da 0 a k-1
+    _, inv = np.unique(np.asarray(labels), return_inverse = True)
+    inv = inv.ravel()
+
+    # Centroidi dei cluster
+    counts = np.bincount(inv)
+    lat_mean = np.bincount(inv, weights = lat)/counts
+    lon_mean = np.bincount(inv, weights = lon)/counts
 
     # Distanza di ogni punto dal centroide del suo cluster
-    points_with_labels['Distance'] = points_with_labels.apply(
-        lambda x: math.sqrt(pow((x['Latitude'] - x['Latitude_mean']),2) + pow((x['Longitude'] - x['Longitude_mean']),2)),
-    axis = 1)
+    distance = np.hypot(lat - lat_mean[inv], lon - lon_mean[inv])
+
+    # Per ogni cluster, il primo punto in ordine di distanza (ordinamento stabile)
+    order = np.lexsort((distance, inv))
+    first = np.ones(len(order), dtype = bool)
+    first[1:] = inv[order][1:] != inv[order][:-1]
+
+    return np.sort(order[first])
+
+
+def add_centroids(points_with_labels):
+
+    """Dati i punti con la loro label, restituisci il punto più vicino al centroide di ogni cluster"""
 
-    # Punti più vicini al centroide del cluster e merge con i punti originali
-    nearest = points_with_labels.loc[points_with_labels.groupby('Label')['Distance'].idxmin()]
-    nearest['Flag_nearest'] = True
-    nearest = nearest[['Point_Name', 'Flag_nearest']]
-    points_with_labels = points_with_labels.merge(nearest, on='Point_Name', how = 'left').fillna(value = False)
+    nearest = representatives(points_with_labels['Label'].to_numpy(),
+                              points_with_labels['Latitude'].to_numpy(),
+                              points_with_labels['Longitude'].to_numpy())
 
-    # Selezione dei punti più vicini al cluster
-    new_points = points_with_labels[points_with_labels['Flag_nearest'] == True].reset_index(drop = True)
+    # Selezione dei punti più vicini al centroide del cluster
+    new_points = points_with_labels.iloc[nearest].reset_index(drop = True)
 
     return new_points[['Latitude', 'Longitude', 'Point_Name']]
 
@@ -296,14 +260,13 @@ def ObjFunZoom(dati, d_meter = 10):
     df_points, lista = points_with_buffer(dati, d)
 
     # Genero le intersezioni di ciascun punto con i successivi
-    groups = dataset_groups(lista)
+    first, second = intersection_edges(lista)
 
     # Cluster dalle intersezioni
-    clusters_p = find_clusters(groups)
-    clusters = find_real_clusters(clusters_p)
+    labels = cluster_labels(len(lista), first, second)
 
     # Etichette ai punti
-    points_with_labels = add_labels(df_points, clusters)
+    points_with_labels = add_labels(df_points, labels)
 
     # Aggiungi i centroidi
     new_points = add_centroids(points_with_labels)
@@ -0,0 +1,128 @@
+#************************************************************************************
+# Questo file contiene le funzioni per provare il sampling su una griglia di parametri,
+# senza ripetere gli step che hanno già gli stessi dati e gli stessi parametri
+#************************************************************************************
+
+from GeoSampling import Sampling as samp
+from GeoSampling import Metrics as mtr
+from GeoSampling import Periodics as pcs
+
+import itertools
+import inspect
+import pandas as pd
+
+#-----------------------------------------------------
+# Griglia di parametri
+#-----------------------------------------------------
+
+def parameter_grid(grid):
+
+    """Elenco dei punti di una griglia di parametri
+
+    grid è un dizionario {parametro: lista di valori} (tutte le combinazioni) oppure già una lista di
+    dizionari {parametro: valore}. I parametri ammessi sono quelli che definiscono gli step
+    (Sampling.sampling_stages): detail, par_identity, clustering, ifzoom, par_zoomed, par_buffer,
+    par_length, finelength, visvalingam, par_area e max_deviation_meter; minPoints è un argomento
+    di ParameterSweep, uguale per tutta la griglia (vedi stage_defaults).
+    """
+
+    if isinstance(grid, dict):
+        names = list(grid.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+    return [dict(point) for point in grid]
+
+
+def stage_defaults():
+
+    """Parametri ammessi nella griglia, con i loro valori predefiniti (quelli di Sampling.sampling_stages)."""
+
+    defaults = {name: parameter.default
+                for name, parameter in inspect.signature(samp.sampling_stages).parameters.items()}
+    del defaults['minPoints']
+
+    return defaults
+
+
+def check_points(points):
+
+    """Solleva un ValueError se un punto della griglia ha parametri non ammessi (vedi parameter_grid)."""
+
+    allowed = stage_defaults()
+    unknown = sorted({name for point in points for name in point if name not in allowed})
+
+    if unknown:
+        raise ValueError("Parametri non ammessi nella griglia: %s (ammessi: %s)"
+                         % (', '.join(map(str, unknown)), ', '.join(allowed)))
+
+
+#-----------------------------------------------------
+# Sweep dei parametri su un poligono
+#-----------------------------------------------------
+
+def sweep_polygon(dati, points, minPoints = 4, cache = None):
+
+    """Sampling di un poligono per ogni punto della griglia (con memoria degli step)
+
+    Per ogni punto della griglia (points, lista di dizionari di parametri) costruisce gli step del
+    sampling (Sampling.sampling_stages) e li esegue con Sampling.run_stages, usando un'unica memoria
+    per tutta la griglia: ogni sequenza distinta di step e parametri viene calcolata una volta sola
+    (per esempio i punti sovrapposti e la media, che non dipendono dal dettaglio).
+    cache (facoltativo) è una StageCache.StageCache condivisa anche tra poligoni e chiamate diverse.
+    Restituisce la lista dei dataframe campionati e la lista dei report di qualità (Metrics.quality_report).
+    """
+
+    check_points(points)
+    defaults = stage_defaults()
+
+    orig_dati = pcs.reset_data(pcs.as_frame(dati))
+    orig_ring = pcs.Ring.from_frame(orig_dati)
+    memo = {}
+
+    sampled, reports = [], []
+
+    for point in points:
+
+        params = {**defaults, **point, 'minPoints': minPoints}
+        stages = samp.sampling_stages(**params)
+        result = samp.run_stages(orig_ring, stages, minPoints, memo = memo, cache = cache).to_frame()
+
+        sampled.append(result)
+        reports.append(mtr.quality_report(dati, result, params['detail']))
+
+    return sampled, reports
+
+
+def ParameterSweep(dati, grid, minPoints = 4, cache = None):
+
+    """Sampling su una griglia di parametri
+
+    dati è un poligono (dataframe oppure PolygonView) oppure un dizionario {ID: poligono}; grid è la griglia
+    dei parametri degli step (vedi parameter_grid: per esempio max_points o analysis non sono ammessi).
+    Per ogni poligono e per ogni punto della griglia fa il sampling, senza ripetere gli step in comune
+    (vedi sweep_polygon), e calcola le metriche.
+    Restituisce un dataframe con una riga per ogni poligono e punto della griglia (colonne: ID_EXT se
+    dati è un dizionario, i parametri, le metriche di Metrics.quality_report e il numero di punti
+    rimasti 'Points'), e la lista dei dataframe campionati, nello stesso ordine delle righe.
+    """
+
+    points = parameter_grid(grid)
+    check_points(points)
+    polygons = dati if isinstance(dati, dict) else {None: dati}
+
+    rows, sampled = [], []
+
+    for id_ext, polygon in polygons.items():
+
+        polygon_sampled, reports = sweep_polygon(polygon, points, minPoints, cache)
+
+        for point, result, report in zip(points, polygon_sampled, reports):
+            row = {'ID_EXT': id_ext} if isinstance(dati, dict) else {}
+            row.update(point)
+            row.update(report)
+            row['Points'] = len(result)
+            rows.append(row)
+
+        sampled.extend(polygon_sampled)
+
+    return pd.DataFrame(rows), sampled
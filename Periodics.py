@@ -3,6 +3,25 @@
 #***********************************************************************
 
 import pandas as pd
+import numpy as np
+
+#-----------------------------------------------------
+# DATI COME DATAFRAME
+#-----------------------------------------------------
+
+def as_frame(dati):
+
+    """Dati come dataframe di Pandas
+
+    I dati possono essere un dataframe di Pandas oppure una vista su un poligono di un PolygonStore
+    (PolygonView): in questo caso il dataframe è costruito sugli stessi array, senza copiare le coordinate.
+    """
+
+    if isinstance(dati, pd.DataFrame):
+        return dati
+
+    return dati.to_frame()
+
 
 #-----------------------------------------------------
 # RESET DATA
@@ -77,4 +96,110 @@ def RC(dati):
     """
 
     dati = dati.iloc[1:len(dati)-1, :]
-    return dati
\ No newline at end of file
+    return dati
+
+#-------------------------------------------------------
+# POLIGONO AD ANELLO
+#-------------------------------------------------------
+
+class Ring:
+
+    """Poligono ad anello (da dati resettati)
+
+    Rappresentazione compatta di un poligono di N punti distinti (dati resettati, righe 0...N-1):
+    gli array delle coordinate e delle etichette originali, che non vengono mai copiati, e l'array idx
+    con le posizioni dei punti rimasti, in ordine. Ogni metodo di rimozione restituisce un nuovo Ring
+    con un idx più corto, che condivide gli stessi array di coordinate.
+    Le condizioni al contorno periodiche non costruiscono nuove righe come PC: i vicini del primo
+    e dell'ultimo punto si leggono modulo N (vedi periodic e unpad).
+    """
+
+    def __init__(self, lat, lon, labels, idx = None, frame = None):
+
+        self.lat = np.asarray(lat, dtype = float)
+        self.lon = np.asarray(lon, dtype = float)
+        self.labels = np.asarray(labels)
+        self.idx = np.arange(len(self.lat)) if idx is None else idx
+        self.frame = frame
+
+    @classmethod
+    def from_frame(cls, dati):
+
+        """Ring a partire da un dataframe resettato con le colonne 'Latitude' e 'Longitude'."""
+
+        return cls(dati['Latitude'].to_numpy(), dati['Longitude'].to_numpy(),
+                   dati.index.to_numpy(), frame = dati)
+
+    def __len__(self):
+        return len(self.idx)
+
+    def subset(self, idx):
+
+        """Nuovo Ring con i punti rimasti in posizione idx (stessi array di coordinate)."""
+
+        return Ring(self.lat, self.lon, self.labels, idx, self.frame)
+
+    def coords(self):
+
+        """Latitudine e longitudine dei punti rimasti (senza condizioni al contorno)."""
+
+        return self.lat[self.idx], self.lon[self.idx]
+
+    def periodic(self):
+
+        """Latitudine e longitudine dei punti rimasti, con condizioni periodiche.
+
+        Equivalente a PC: N+2 valori, in cui il primo è l'ultimo punto e l'ultimo è il primo punto.
+        Le posizioni sono lette modulo N dall'array idx, senza costruire dataframe.
+        """
+
+        pos = np.take(self.idx, np.arange(-1, len(self.idx)+1), mode = 'wrap')
+        return self.lat[pos], self.lon[pos]
+
+    def periodic_positions(self):
+
+        """Posizioni negli array delle coordinate dei punti di periodic(), crescenti.
+
+        Come in periodic, il primo valore è l'ultimo punto e l'ultimo valore è il primo punto, ma le
+        posizioni non sono ridotte modulo N (idx[-1] - N all'inizio, idx[0] + N alla fine): così i punti
+        originali tra due punti consecutivi sono sempre quelli con le posizioni intermedie (modulo N).
+        Usate da RemovingPoints.DeviationBound.
+        """
+
+        n = len(self.lat)
+        return np.concatenate([[self.idx[-1] - n], self.idx, [self.idx[0] + n]])
+
+    def unpad(self, keep):
+
+        """Applica una maschera calcolata sui dati periodici e rimuove le condizioni al contorno.
+
+        keep è la maschera (N+2 valori) restituita da un metodo di rimozione applicato a periodic().
+        Come RC, si tolgono il primo e l'ultimo dei punti rimasti: se l'ultima riga (copia del primo
+        punto) è stata rimossa, viene tolto l'ultimo punto rimasto, esattamente come succedeva con PC/RC.
+        """
+
+        surv = np.flatnonzero(keep)[1:-1]
+        return self.subset(self.idx[surv - 1])
+
+    def take(self, keep):
+
+        """Applica una maschera calcolata sui punti rimasti (senza condizioni al contorno)."""
+
+        return self.subset(self.idx[keep])
+
+    def select(self, labels):
+
+        """Tiene solo i punti con le etichette indicate (per esempio i punti scelti da un clustering)."""
+
+        pos = pd.Index(self.labels).get_indexer(labels)
+        return self.subset(np.sort(pos))
+
+    def to_frame(self):
+
+        """Dataframe dei punti rimasti, con le etichette originali come indice."""
+
+        if self.frame is not None:
+            return self.frame.iloc[self.idx]
+
+        lat, lon = self.coords()
+        return pd.DataFrame({'Latitude': lat, 'Longitude': lon}, index = self.labels[self.idx])
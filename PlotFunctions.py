@@ -3,14 +3,12 @@
 # plot_polygon, per plottare il poligono
 # ***********************************************************************************************
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
+# Matplotlib e Seaborn sono importati dentro le funzioni: importare il modulo non carica le librerie grafiche
 from shapely.geometry import Point
 import math
-from numpy.linalg import norm
-import seaborn as sns
 
 from GeoSampling import DBSCANsampling as DBsamp
+from GeoSampling import RemovingLength as rl
 
 #---------------------------------------
 # Funzione per plottare i poligoni dati
@@ -27,6 +25,9 @@ def plot_polygon(dati, titolo = 'Poligono', s = 1):
     fattore di scala a cui si vuole sia ingrandita la figura.
     """
     
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Polygon
+
     if (not isinstance(titolo, str)):
         raise Exception("L'argomento 'Titolo' deve essere una stringa")
     
@@ -72,6 +73,8 @@ def plot_zoom(dati, d_meter = 10, s=1):
     s (parametro che ingrandisce la tela in cui il grafico viene stampato)
     """
 
+    import matplotlib.pyplot as plt
+
     radius = 6371000
     d = 360*d_meter/(2*math.pi*radius)
     
@@ -104,16 +107,14 @@ def plot_length(dati):
     L'istogramma viene prodotto grazie a Seaborn.
     """
 
-    distances = []
+    import seaborn as sns
 
-    # Calcolo delle distanze tra punti consecutivi
-    for i in range(0, len(dati)-2):
-        A = dati.iloc[i].to_numpy()
-        B = dati.iloc[i+1].to_numpy()
-        distance = norm(A-B)
-        radius = 6371000
-        distance_meter = 2*math.pi*radius*distance/360 #Distanze in metri
-        distances.append(distance_meter)
+    # Calcolo delle distanze tra punti consecutivi (tutte insieme, tranne l'ultimo segmento)
+    distances = rl.segment_lengths(dati['Latitude'].to_numpy(), dati['Longitude'].to_numpy())
+    distances = distances[:max(len(dati)-2, 0)]
+
+    radius = 6371000
+    distances = 2*math.pi*radius*distances/360 #Distanze in metri
 
     # Istogramma delle distanze (senza opzioni di bin)
     sns.displot(distances)
@@ -130,6 +131,9 @@ def plot_DBSCAN(orig_dati, eps_meter = 10, titolo = 'DBSCAN model', s=1):
     A partire dai dati, plot di come i punti vengono clusterizzati dal DBSCAN, dato l'eps indicato.
     """
     
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Polygon
+
     # Risultati del DBSCAN calcolati
     dati = DBsamp.DBSCANmodel(orig_dati, eps_meter)
 
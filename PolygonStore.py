@@ -0,0 +1,266 @@
+#************************************************************************************
+# Questo file contiene il PolygonStore: un archivio colonnare di tanti poligoni,
+# con un unico array di coordinate e gli offsets di ogni poligono
+#************************************************************************************
+
+import json
+import os
+import pandas as pd
+import numpy as np
+
+#-----------------------------------------------------
+# Vista su un poligono
+#-----------------------------------------------------
+
+class PolygonView:
+
+    """Vista su un poligono di un PolygonStore
+
+    Un poligono nel formato di input del pacchetto (N+1 punti, la riga 0 uguale alla riga N), dato
+    dalle fette degli array di latitudine e longitudine dell'archivio: nessuna coordinata viene copiata.
+    L'indice dei punti è 0...N, come nei dataframe di input.
+    Sampling.Sampling, le funzioni di Metrics e Sampling.r_detailq accettano una vista al posto del dataframe.
+    """
+
+    def __init__(self, id_ext, lat, lon):
+
+        self.id_ext = id_ext
+        self.lat = lat
+        self.lon = lon
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def index(self):
+        return pd.RangeIndex(len(self.lat))
+
+    def to_frame(self):
+
+        """Dataframe con le colonne 'Latitude' e 'Longitude' costruito sugli stessi array (senza copia)."""
+
+        return pd.DataFrame({'Latitude': self.lat, 'Longitude': self.lon}, index = self.index, copy = False)
+
+
+#-----------------------------------------------------
+# Archivio colonnare di poligoni
+#-----------------------------------------------------
+
+class PolygonStore:
+
+    """Archivio colonnare di poligoni
+
+    Tutti i poligoni sono memorizzati in due array contigui (latitudine e longitudine), uno dopo l'altro;
+    l'array offsets (numero di poligoni + 1 interi) indica dove inizia e finisce ogni poligono, e la
+    tabella attributes contiene gli altri dati (tra cui ID_EXT), una riga per poligono.
+    Su disco l'archivio è una cartella con gli array in formato binario grezzo (lat.f8, lon.f8, offsets.i8),
+    la tabella attributes.csv e i tipi delle sue colonne (attributes.json), così che per esempio gli ID_EXT
+    come '001' restino stringhe; open riapre gli array con np.memmap, così che più processi
+    condividano le stesse pagine di memoria invece di ricevere i dataframe serializzati.
+    """
+
+    def __init__(self, lat, lon, offsets, attributes):
+
+        self.lat = lat
+        self.lon = lon
+        self.offsets = offsets
+        self.attributes = attributes.reset_index(drop = True)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def sizes(self):
+
+        """Numero di punti di ogni poligono."""
+
+        return np.diff(self.offsets)
+
+    def polygon(self, k):
+
+        """Vista (PolygonView) sul poligono in posizione k."""
+
+        start = self.offsets[k]
+        end = self.offsets[k + 1]
+
+        return PolygonView(self.attributes['ID_EXT'].iat[k], self.lat[start:end], self.lon[start:end])
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self.polygon(k)
+
+    #------------------------
+    # Costruzione
+    #------------------------
+
+    @classmethod
+    def from_frame(cls, figures):
+
+        """Archivio a partire dal db lungo prodotto da db_preparation (una riga per punto)."""
+
+        codes, ids = pd.factorize(figures['ID_EXT'])
+        order = np.argsort(codes, kind = 'stable')
+
+        offsets = np.zeros(len(ids) + 1, dtype = np.int64)
+        offsets[1:] = np.cumsum(np.bincount(codes, minlength = len(ids)))
+
+        # Attributi: la prima riga di ogni poligono, senza le coordinate
+        attributes = figures.iloc[order].drop(labels = ['Latitude', 'Longitude'], axis = 1)
+        attributes = attributes.iloc[offsets[:-1]]
+
+        lat = figures['Latitude'].to_numpy(dtype = float)[order]
+        lon = figures['Longitude'].to_numpy(dtype = float)[order]
+
+        return cls(lat, lon, offsets, attributes)
+
+    @classmethod
+    def from_stream(cls, stream):
+
+        """Archivio in memoria a partire dai blocchi restituiti da DataImport.db_stream."""
+
+        attributes, offsets, lat, lon = [], [np.zeros(1, dtype = np.int64)], [], []
+        base = 0
+
+        for chunk_attributes, chunk_offsets, chunk_lat, chunk_lon in stream:
+            attributes.append(chunk_attributes)
+            offsets.append(chunk_offsets[1:] + base)
+            lat.append(chunk_lat)
+            lon.append(chunk_lon)
+            base = base + chunk_offsets[-1]
+
+        return cls(np.concatenate(lat), np.concatenate(lon), np.concatenate(offsets), pd.concat(attributes))
+
+    #------------------------
+    # Salvataggio su disco
+    #------------------------
+
+    @classmethod
+    def write(cls, path, stream):
+
+        """Scrive su disco un archivio a partire dai blocchi di DataImport.db_stream e lo riapre.
+
+        I blocchi vengono aggiunti uno alla volta in coda ai file, quindi l'archivio può essere più grande
+        della memoria disponibile. Tutti i blocchi devono avere le stesse colonne; i tipi salvati alla fine
+        sono quelli comuni a tutti i blocchi (vedi merge_dtypes).
+        """
+
+        os.makedirs(path, exist_ok = True)
+        base = 0
+        header = True
+        dtypes = None
+
+        with open(os.path.join(path, 'lat.f8'), 'wb') as f_lat, \
+             open(os.path.join(path, 'lon.f8'), 'wb') as f_lon, \
+             open(os.path.join(path, 'offsets.i8'), 'wb') as f_offsets:
+
+            f_offsets.write(np.zeros(1, dtype = '<i8').tobytes())
+
+            for attributes, offsets, lat, lon in stream:
+                dtypes = merge_dtypes(dtypes, attributes)
+                f_lat.write(np.asarray(lat, dtype = '<f8').tobytes())
+                f_lon.write(np.asarray(lon, dtype = '<f8').tobytes())
+                f_offsets.write((np.asarray(offsets[1:]) + base).astype('<i8').tobytes())
+                attributes.to_csv(os.path.join(path, 'attributes.csv'), mode = 'w' if header else 'a',
+                                  header = header, index = False)
+                base = base + int(offsets[-1])
+                header = False
+
+        # Nessun blocco: tabella degli attributi vuota
+        if header:
+            empty = pd.DataFrame({'ID_EXT': pd.Series(dtype = object)})
+            empty.to_csv(os.path.join(path, 'attributes.csv'), index = False)
+            dtypes = merge_dtypes(None, empty)
+
+        write_dtypes(path, dtypes)
+
+        return cls.open(path)
+
+    def save(self, path):
+
+        """Salva l'archivio su disco (vedi write) e lo riapre."""
+
+        return PolygonStore.write(path, [(self.attributes, self.offsets, self.lat, self.lon)])
+
+    @classmethod
+    def open(cls, path, attributes = True):
+
+        """Riapre un archivio salvato su disco, con gli array in sola lettura tramite np.memmap.
+
+        Con attributes = False la tabella degli attributi non viene letta (resta vuota): serve ai processi
+        che ricevono già gli ID_EXT dei loro poligoni e hanno bisogno solo delle coordinate.
+        """
+
+        def memmap(name, dtype):
+            filename = os.path.join(path, name)
+            if os.path.getsize(filename) == 0:
+                return np.zeros(0, dtype = dtype)
+            return np.memmap(filename, dtype = dtype, mode = 'r')
+
+        lat = memmap('lat.f8', '<f8')
+        lon = memmap('lon.f8', '<f8')
+        offsets = memmap('offsets.i8', '<i8')
+        if attributes:
+            table = read_attributes(path)
+        else:
+            table = pd.DataFrame({'ID_EXT': pd.Series(dtype = object)})
+
+        return cls(lat, lon, offsets, table)
+
+
+#-----------------------------------------------------
+# Tipi delle colonne della tabella degli attributi
+#-----------------------------------------------------
+
+def merge_dtypes(dtypes, attributes):
+
+    """Tipi delle colonne dopo l'aggiunta di un blocco della tabella degli attributi
+
+    dtypes è il dizionario dei tipi dei blocchi precedenti (None per il primo blocco). Per ogni colonna si
+    prende il tipo comune, lo stesso che darebbe pd.concat dei blocchi: per esempio una colonna di interi
+    in un blocco e con dei NaN in un altro diventa float64. Se il blocco ha colonne diverse dai
+    precedenti, solleva un ValueError.
+    """
+
+    new = dict(attributes.dtypes.items())
+
+    if dtypes is None:
+        return new
+
+    if list(new) != list(dtypes):
+        raise ValueError("Le colonne degli attributi (%s) sono diverse da quelle dei blocchi precedenti (%s)"
+                         % (', '.join(map(str, new)), ', '.join(map(str, dtypes))))
+
+    return {column: pd.concat([pd.Series(dtype = dtypes[column]), pd.Series(dtype = new[column])]).dtype
+            for column in dtypes}
+
+
+def write_dtypes(path, dtypes):
+
+    """Salva in attributes.json il tipo di ogni colonna della tabella degli attributi."""
+
+    with open(os.path.join(path, 'attributes.json'), 'w') as f:
+        json.dump({column: str(dtype) for column, dtype in dtypes.items()}, f)
+
+
+def read_attributes(path):
+
+    """Legge attributes.csv con i tipi salvati in attributes.json
+
+    Le colonne di testo (object o string) vengono lette come stringhe, senza conversioni (per esempio
+    '001' resta '001'); le date vengono riconvertite in datetime.
+    """
+
+    with open(os.path.join(path, 'attributes.json')) as f:
+        dtypes = json.load(f)
+
+    read_dtypes = {}
+    dates = []
+    for column, dtype in dtypes.items():
+        if dtype.startswith('datetime'):
+            dates.append(column)
+        elif dtype in ('object', 'str', 'string'):
+            read_dtypes[column] = str
+        else:
+            read_dtypes[column] = dtype
+
+    return pd.read_csv(os.path.join(path, 'attributes.csv'), dtype = read_dtypes, parse_dates = dates,
+                       keep_default_na = False, na_values = [''])
@@ -0,0 +1,128 @@
+#************************************************************************************************
+# Questo file contiene il metodo di Visvalingam-Whyatt: i punti vengono rimossi in ordine di
+# area efficace (l'area del triangolo con i due vicini), dalla più piccola alla più grande.
+# ***********************************************************************************************
+
+from GeoSampling import RemovingPoints as rp
+
+import heapq
+import numpy as np
+import math
+
+#--------------------------------------------------------------
+# Aree dei triangoli formati da ogni punto con i suoi vicini
+#--------------------------------------------------------------
+
+def triangle_areas(lat, lon):
+
+    """Aree dei triangoli (prev, i, next) di un poligono ciclico.
+
+    A partire dagli array di latitudine e longitudine di N punti (senza la riga di chiusura), restituisce
+    l'array delle N aree, in GRADI quadrati, del triangolo formato da ogni punto con il precedente e il
+    successivo (il precedente del primo punto è l'ultimo, e il successivo dell'ultimo è il primo).
+    """
+
+    lat = np.asarray(lat, dtype = float)
+    lon = np.asarray(lon, dtype = float)
+
+    ax, ay = np.roll(lat, 1), np.roll(lon, 1)
+    cx, cy = np.roll(lat, -1), np.roll(lon, -1)
+
+    return 0.5*np.abs((lat - ax)*(cy - ay) - (lon - ay)*(cx - ax))
+
+
+#--------------------------------------------------------------
+# Metodo di Visvalingam-Whyatt
+#--------------------------------------------------------------
+
+def visvalingam_mask(lat, lon, area_min, min_points = 3, bound = None):
+
+    """Maschera dei punti da tenere secondo il metodo di Visvalingam-Whyatt.
+
+    A partire dagli array di latitudine e longitudine di un poligono ciclico (N punti, senza la riga di
+    chiusura) e dall'area minima area_min (in GRADI quadrati), restituisce un array booleano che vale
+    True per i punti da tenere.
+    Ogni punto ha come area efficace l'area del triangolo con i suoi vicini rimasti: si toglie sempre il
+    punto con l'area efficace più piccola, finché questa è minore di area_min o finché restano
+    min_points punti. Dopo ogni rimozione si aggiornano solo le aree dei due vicini, che non possono
+    diventare più piccole dell'area del punto appena tolto (così l'ordine di rimozione è monotono).
+    Le aree sono in una coda di priorità (heapq): le voci non più valide restano nella coda e vengono
+    scartate quando escono, quindi il costo è O(N log N).
+    bound (facoltativo) è un RemovingPoints.DeviationBound: un punto viene tolto solo se i punti originali
+    tra i suoi due vicini restano entro lo scarto massimo dalla loro retta; altrimenti resta, finché
+    un vicino non viene tolto e la sua area non viene aggiornata.
+    """
+
+    lat = np.asarray(lat, dtype = float)
+    lon = np.asarray(lon, dtype = float)
+
+    n = len(lat)
+    keep = np.ones(n, dtype = bool)
+
+    if n <= min_points:
+        return keep
+
+    area = triangle_areas(lat, lon).tolist()
+    x = lat.tolist()
+    y = lon.tolist()
+    prev = [(i - 1) % n for i in range(n)]
+    succ = [(i + 1) % n for i in range(n)]
+
+    heap = [(a, i) for i, a in enumerate(area)]
+    heapq.heapify(heap)
+    remaining = n
+
+    while heap and remaining > min_points:
+
+        a, i = heapq.heappop(heap)
+
+        # Voce non più valida (punto già tolto, oppure area aggiornata)
+        if not keep[i] or a != area[i]:
+            continue
+
+        if a >= area_min:
+            break
+
+        if bound is not None and not bound.allows(prev[i], succ[i]):
+            continue
+
+        keep[i] = False
+        remaining = remaining - 1
+
+        p, s = prev[i], succ[i]
+        succ[p] = s
+        prev[s] = p
+
+        # Nuove aree efficaci dei due vicini
+        for j in (p, s):
+            pj, sj = prev[j], succ[j]
+            new_area = 0.5*abs((x[j] - x[pj])*(y[sj] - y[pj]) - (y[j] - y[pj])*(x[sj] - x[pj]))
+            area[j] = max(new_area, a)
+            heapq.heappush(heap, (area[j], j))
+
+    return keep
+
+
+def rem_visvalingam(dati, area_meter2 = 50, max_deviation_meter = None):
+
+    """Rimozione dei punti con il metodo di Visvalingam-Whyatt.
+
+    A partire da un dataframe di Pandas resettato (N punti distinti, senza la riga di chiusura) per cui
+    c'è una colonna che si chiama 'Latitude' e una che si chiama 'Longitude', questa funzione toglie uno
+    alla volta i punti che formano con i loro vicini il triangolo di area più piccola, finché l'area più
+    piccola è minore di area_meter2 (in metri quadrati) (vedi visvalingam_mask).
+    Con max_deviation_meter (in metri) un punto viene tolto solo se i punti tolti restano entro questa
+    distanza dal segmento che li sostituisce (vedi RemovingPoints.DeviationBound).
+    Il poligono è considerato ciclico: NON servono condizioni al contorno.
+    """
+
+    # Da metri quadrati a gradi quadrati
+    radius = 6371000
+    area_min = area_meter2*(360/(2*math.pi*radius))**2
+
+    lat = dati['Latitude'].to_numpy()
+    lon = dati['Longitude'].to_numpy()
+
+    keep = visvalingam_mask(lat, lon, area_min, bound = rp.deviation_bound(lat, lon, max_deviation_meter, periodic = False))
+
+    return dati[keep]
@@ -3,14 +3,137 @@
 # Questo file contiene le funzioni che rimuovono i punti se il segmento creato è troppo piccolo.
 # ***********************************************************************************************
 
-from shapely.geometry import LineString
+from GeoSampling import RemovingPoints as rp
+
+import numpy as np
 import math
 
+#--------------------------------------------------------------
+# Lunghezze dei segmenti (cache)
+#--------------------------------------------------------------
+
+def segment_lengths(lat, lon):
+
+    """Lunghezze dei segmenti tra punti consecutivi.
+
+    A partire dagli array di latitudine e longitudine (N punti), restituisce l'array delle N-1 lunghezze
+    dei segmenti tra il punto i e il punto i+1, in GRADI, calcolate come sqrt(dx^2 + dy^2)
+    (la stessa formula della lunghezza di una LineString).
+    """
+
+    dx = np.diff(np.asarray(lat, dtype = float))
+    dy = np.diff(np.asarray(lon, dtype = float))
+
+    return np.sqrt(dx*dx + dy*dy)
+
+
+def length_mask(lat, lon, lenmin, bound = None):
+
+    """Maschera dei punti da tenere secondo il metodo dei segmenti corti.
+
+    A partire dagli array di latitudine e longitudine e dalla lunghezza minima lenmin (in GRADI),
+    restituisce un array booleano che vale True per i punti da tenere. A è l'ultimo punto rimasto e B il
+    punto successivo: se AB è più lungo di lenmin, B diventa il nuovo A; altrimenti B viene tolto e si
+    considera il punto dopo. Le lunghezze dei segmenti consecutivi sono calcolate una volta sola
+    (segment_lengths); dopo una rimozione si ricalcola solo il segmento che cambia.
+    bound (facoltativo) è un RemovingPoints.DeviationBound: B viene tolto solo se i punti originali tra A
+    e il punto dopo B restano entro lo scarto massimo dalla loro retta; in questo caso l'ultimo punto
+    (la condizione al contorno) non viene mai tolto.
+    """
+
+    lat = np.asarray(lat, dtype = float)
+    lon = np.asarray(lon, dtype = float)
+
+    n = len(lat)
+    keep = np.ones(n, dtype = bool)
+
+    if n < 2:
+        return keep
+
+    seg = segment_lengths(lat, lon).tolist()
+    x = lat.tolist()
+    y = lon.tolist()
+
+    a = 0
+    ab = seg[0]
+
+    for b in range(1, n):
+
+        if ab > lenmin or (bound is not None and (b == n-1 or not bound.allows(a, b+1))):
+            a = b
+            if b < n-1:
+                ab = seg[b]
+        else:
+            keep[b] = False
+            if b < n-1:
+                ab = math.sqrt((x[b+1] - x[a])**2 + (y[b+1] - y[a])**2)
+
+    return keep
+
+
+def finelength_mask(lat, lon, lenmin, bound = None):
+
+    """Maschera dei punti da tenere secondo il metodo dei segmenti corti (tenendo conto del successivo).
+
+    A partire dagli array di latitudine e longitudine e dalla lunghezza minima lenmin (in GRADI),
+    restituisce un array booleano che vale True per i punti da tenere, con la stessa macchina a stati
+    di rem_finelength sui punti A (ultimo rimasto), B, C:
+    - se BC non è corto, si passa direttamente a C (i += 2);
+    - se BC è corto e AB è corto, si toglie B e A resta fermo;
+    - se BC è corto e AB non è corto, B diventa il nuovo A (i += 1).
+    "Corto" significa strettamente minore di lenmin: una lunghezza uguale alla soglia non causa mai
+    la rimozione di un punto.
+    Le lunghezze dei segmenti consecutivi sono calcolate una volta sola (segment_lengths);
+    dopo una rimozione si ricalcola solo il segmento AB che cambia.
+    bound (facoltativo) è un RemovingPoints.DeviationBound: B viene tolto solo se i punti originali tra A
+    e C restano entro lo scarto massimo dalla retta AC; altrimenti B diventa il nuovo A.
+    """
+
+    lat = np.asarray(lat, dtype = float)
+    lon = np.asarray(lon, dtype = float)
+
+    n = len(lat)
+    keep = np.ones(n, dtype = bool)
+
+    if n < 3:
+        return keep
+
+    seg = segment_lengths(lat, lon).tolist()
+    x = lat.tolist()
+    y = lon.tolist()
+
+    a = 0
+    b = 1
+    ab = seg[0]
+
+    while b < n-1:
+
+        bc = seg[b]
+
+        if not bc < lenmin:
+            a = b + 1
+            b = b + 2
+            if a < n-1:
+                ab = seg[a]
+
+        elif ab < lenmin and (bound is None or bound.allows(a, b+1)):
+            keep[b] = False
+            b = b + 1
+            ab = math.sqrt((x[b] - x[a])**2 + (y[b] - y[a])**2)
+
+        else:
+            a = b
+            b = b + 1
+            ab = bc
+
+    return keep
+
+
 #--------------------------------------------------------------
 # Rimozione dei punti che formano segmenti troppo corti
 #--------------------------------------------------------------
 
-def rem_length(dati, lenmin_meter = 100):
+def rem_length(dati, lenmin_meter = 100, max_deviation_meter = None):
 
     """Rimozione dei punti che formano segmenti troppo corti. 
 
@@ -20,6 +143,8 @@ def rem_length(dati, lenmin_meter = 100):
     considera B e ricomincia.
     Il primo argomento sono i dati nel formato sopra, il secondo argomento è la lunghezza minima del segmento.
     Valori consigliati per la lunghezza minima: 100m (valore predefinito)
+    Con max_deviation_meter (in metri) un punto viene tolto solo se i punti tolti restano entro questa
+    distanza dal segmento che li sostituisce (vedi RemovingPoints.DeviationBound).
     NOTA: condizioni al contorno necessarie, da porre FUORI dalla funzione.
     """
 
@@ -27,31 +152,12 @@ def rem_length(dati, lenmin_meter = 100):
     radius = 6371000
     lenmin = 360*lenmin_meter/(2*math.pi*radius)
 
-    i = 0
-    end = len(dati) - 1
-
-    while i < end:
-        
-        values = dati[i:i+2]
-
-        # Condizione di uscita dovuta alla rimozione dei punti in-place.
-        if len(values) < 2:
-            return dati
-        
-        # Definisco AB
-        AB = LineString([
-            (dati.iloc[i]['Latitude'], dati.iloc[i]['Longitude']), 
-            (dati.iloc[i+1]['Latitude'], dati.iloc[i+1]['Longitude'])
-        ])
-        
-        if AB.length > lenmin:
-            i = i + 1
-            
-        else:
-            dati = dati.drop(dati.iloc[i+1].name, axis = 0)
-            end = end - 1
-            
-    return dati
+    lat = dati['Latitude'].to_numpy()
+    lon = dati['Longitude'].to_numpy()
+
+    keep = length_mask(lat, lon, lenmin, rp.deviation_bound(lat, lon, max_deviation_meter))
+
+    return dati[keep]
 
 
 
@@ -59,7 +165,7 @@ def rem_length(dati, lenmin_meter = 100):
 # Rimozione dei punti che formano segmenti troppo corti (tenendo conto del segmento successivo)
 #--------------------------------------------------------------------------------------------------
 
-def rem_finelength(dati, lenmin_meter = 100):
+def rem_finelength(dati, lenmin_meter = 100, max_deviation_meter = None):
 
     """Rimozione dei punti che formano segmenti troppo corti (tenendo conto del segmento successivo)
 
@@ -72,8 +178,11 @@ def rem_finelength(dati, lenmin_meter = 100):
     Se BC supera la lunghezza minima, salto direttamente a considerare C; se invece BC non la supera, 
     allora ho i due casi come sopra: se AB è troppo corto, elimino B
     e al nuovo passo parto da A; altrimenti, tengo B e al nuovo passo parto da B.
+    Una lunghezza uguale alla soglia non è considerata corta (vedi finelength_mask).
     Il primo argomento sono i dati nel formato sopra, il secondo argomento è la lunghezza minima del segmento.
     Valori consigliati per la lunghezza minima: 100m (valore predefinito).
+    Con max_deviation_meter (in metri) un punto viene tolto solo se i punti tolti restano entro questa
+    distanza dal segmento che li sostituisce (vedi RemovingPoints.DeviationBound).
     NOTA: condizioni al contorno necessarie, da porre fuori dalla funzione.
     """
 
@@ -83,39 +192,9 @@ def rem_finelength(dati, lenmin_meter = 100):
     radius = 6371000
     lenmin = 360*lenmin_meter/(2*math.pi*radius)
 
-    i = 0
-    end = len(dati) - 2
-
-    while i < end:
-
-        values = dati[i:i+3]
-
-        # Condizione di uscita dovuta alla rimozione dei punti in-place.
-        if len(values) < 3:
-            return dati
-        
-        # Definisco AB, BC
-
-        AB = LineString([
-            (values.iloc[0]['Latitude'], values.iloc[0]['Longitude']), 
-            (values.iloc[1]['Latitude'], values.iloc[1]['Longitude'])
-        ])
-        
-        BC = LineString([
-            (values.iloc[1]['Latitude'], values.iloc[1]['Longitude']), 
-            (values.iloc[2]['Latitude'], values.iloc[2]['Longitude'])
-        ])
-        
-        # Test
-
-        if BC.length > lenmin:
-            i = i + 2
-            
-        if BC.length < lenmin and AB.length < lenmin:
-            dati = dati.drop(values.iloc[1].name, axis = 0)
-            end = end - 1
-            
-        if BC.length < lenmin and AB.length > lenmin:
-            i = i + 1
-            
-    return dati
\ No newline at end of file
+    lat = dati['Latitude'].to_numpy()
+    lon = dati['Longitude'].to_numpy()
+
+    keep = finelength_mask(lat, lon, lenmin, rp.deviation_bound(lat, lon, max_deviation_meter))
+
+    return dati[keep]
@@ -1,17 +1,146 @@
 # **********************************************************************************************
-# Questo file contiene due funzioni che ho scritto per rimuovere i punti:
+# Questo file contiene le funzioni che ho scritto per rimuovere i punti:
 # rem_overlap, che rimuove i punti se sono sovrapposti;
 # rem_median, che rimuove i punti se sono sulla media degli altri due;
 # rem_buffer, che rimuove i punti se sono nel buffer degli altri due.
 # ***********************************************************************************************
 
-from shapely.geometry import LineString, Point
+import numpy as np
 import math
 
+#----------------------------------------------------------------------
+# Scarto massimo dei punti tolti (comune a tutti i metodi di rimozione)
+#----------------------------------------------------------------------
+
+class DeviationBound:
+
+    """Limite allo scarto dei punti originali tolti
+
+    Un metodo di rimozione (median_mask, buffer_mask, RemovingLength.length_mask,
+    RemovingLength.finelength_mask, RemovingArea.visvalingam_mask) può ricevere un DeviationBound:
+    prima di togliere dei punti, il metodo chiede con allows(a, c) se tutti i punti ORIGINALI tra i punti
+    a e c (posizioni negli array passati al metodo) sono entro max_dev dalla retta AC che li sostituisce,
+    e se non lo sono il punto non viene tolto.
+    "Originali" comprende anche i punti tolti dagli step precedenti: orig_lat e orig_lon sono gli array
+    di tutti i punti (per esempio quelli di un Periodics.Ring), e pos sono le posizioni in questi array
+    dei punti passati al metodo, crescenti e lette modulo il numero di punti originali (vedi
+    Periodics.Ring.periodic_positions). Lo scarto è la distanza punto-retta di Metrics.maxDistance
+    (se A e C coincidono, la distanza dal punto A), in GRADI come max_dev: se ogni rimozione rispetta il
+    limite, anche maxDistance del risultato lo rispetta, senza doverla calcolare dopo.
+    periodic = True indica che il metodo riceve dati con condizioni periodiche (come PC): il penultimo
+    punto (l'ultimo vero punto, copiato anche in prima posizione) non viene mai tolto, perché le decisioni
+    sul primo e sull'ultimo vero punto presuppongono che la sua copia resti al suo posto.
+    """
+
+    def __init__(self, orig_lat, orig_lon, pos, max_dev, periodic = True):
+
+        self.orig_lat = np.asarray(orig_lat, dtype = float)
+        self.orig_lon = np.asarray(orig_lon, dtype = float)
+        self.x = self.orig_lat.tolist()
+        self.y = self.orig_lon.tolist()
+        self.pos = np.asarray(pos).tolist()
+        self.n = len(self.orig_lat)
+        self.max_dev2 = max_dev*max_dev
+        self.protected = len(self.pos) - 2 if periodic else -1
+
+    @classmethod
+    def from_points(cls, lat, lon, max_dev, periodic = True):
+
+        """Limite per un metodo applicato a tutti i punti originali (per esempio rem_buffer su un dataframe)."""
+
+        return cls(lat, lon, np.arange(len(lat)), max_dev, periodic)
+
+    def allows(self, a, c):
+
+        """True se tutti i punti originali tra a e c sono entro max_dev dalla retta AC."""
+
+        if a < self.protected < c:
+            return False
+
+        pa = self.pos[a]
+        pc = self.pos[c]
+        if pc <= pa:
+            pc = pc + self.n
+
+        if pc - pa < 2:
+            return True
+
+        x, y, n = self.x, self.y, self.n
+        ax = x[pa % n]
+        ay = y[pa % n]
+        dx = x[pc % n] - ax
+        dy = y[pc % n] - ay
+        den = dx*dx + dy*dy
+
+        # Pochi punti tra A e C (il caso normale): calcolo scalare
+        if pc - pa <= 32:
+            for k in range(pa + 1, pc):
+                px = x[k % n] - ax
+                py = y[k % n] - ay
+                if den > 0:
+                    cross = dx*py - dy*px
+                    dist2 = cross*cross/den
+                else:
+                    dist2 = px*px + py*py
+                if dist2 > self.max_dev2:
+                    return False
+            return True
+
+        k = np.arange(pa + 1, pc) % n
+        px = self.orig_lat[k] - ax
+        py = self.orig_lon[k] - ay
+
+        if den > 0:
+            cross = dx*py - dy*px
+            dist2 = cross*cross/den
+        else:
+            dist2 = px*px + py*py
+
+        return dist2.max() <= self.max_dev2
+
+
+def deviation_bound(lat, lon, max_deviation_meter = None, periodic = True):
+
+    """DeviationBound sui punti dati, con lo scarto massimo in metri (None se max_deviation_meter è None)."""
+
+    if max_deviation_meter is None:
+        return None
+
+    # Da metri a gradi
+    radius = 6371000
+    max_dev = 360*max_deviation_meter/(2*math.pi*radius)
+
+    return DeviationBound.from_points(lat, lon, max_dev, periodic)
+
 #----------------------------------------------------------------------
 # Funzione per rimuovere i punti sovrapposti
 #----------------------------------------------------------------------
 
+def overlap_mask(lat, lon, identity = True, acc = 4):
+
+    """Maschera dei punti da tenere secondo il metodo dei punti sovrapposti.
+
+    A partire dagli array di latitudine e longitudine, restituisce un array booleano che vale True per i
+    punti da tenere. Un punto B viene tolto se ha le stesse coordinate del punto A che lo precede
+    tra quelli rimasti: poiché l'uguaglianza (esatta o a meno di acc cifre decimali) è transitiva, basta
+    confrontare ogni punto con il precedente, e la maschera si ottiene con un solo passaggio lineare.
+    """
+
+    lat = np.asarray(lat, dtype = float)
+    lon = np.asarray(lon, dtype = float)
+
+    # Confronto a meno di acc cifre decimali (stesso arrotondamento di numpy usato finora)
+    if not identity:
+        lat = np.round(lat, acc)
+        lon = np.round(lon, acc)
+
+    # Il primo punto resta sempre
+    keep = np.ones(len(lat), dtype = bool)
+    keep[1:] = (lat[1:] != lat[:-1]) | (lon[1:] != lon[:-1])
+
+    return keep
+
+
 def rem_overlap(dati, identity = True, acc = 4):
 
     """Rimuove un punto se è sovrapposto a un altro.
@@ -20,94 +149,160 @@ def rem_overlap(dati, identity = True, acc = 4):
     'Longitude', questa funzione considera i punti a due a due (A, B) e rimuove B se ha le stesse coordinate di A,
     dove per "stesse coordinate" si intende che sono le stesse identiche (identity = True), oppure che sono
     le stesse a meno di acc cifre decimali (acc = 4, valore predefinito).
+    I punti rimasti mantengono le etichette originali (vedi overlap_mask).
     NOTA: condizioni al contorno necessarie, da porre FUORI dal dataset.
     """
 
-    i = 0
-    end = len(dati)-1
-    
-    while i < end:
-        
-        values = dati[i:i+2]
-
-        # Condizione di uscita dovuta alla rimozione dei punti in-place
-        if len(values) < 2:
-            return dati
-        
-        # Posizione dei punti
-        
-        firstLat = values.iloc[0]['Latitude']
-        firstLong = values.iloc[0]['Longitude']
-        secondLat = values.iloc[1]['Latitude']
-        secondLong = values.iloc[1]['Longitude']
-        
-        # Rimozione dei punti
-        
-        if identity:
-            if firstLat == secondLat and firstLong == secondLong:
-                dati = dati.drop(values.iloc[1].name, axis = 0)
-                end = end - 1
-            else:
-                i = i + 1
-        else:
-            if round(firstLat, acc) == round(secondLat, acc) and round(firstLong, acc) == round(secondLong, acc):
-                dati = dati.drop(values.iloc[1].name, axis = 0)
-                end = end - 1
-            else:
-                i = i + 1
+    keep = overlap_mask(dati['Latitude'].to_numpy(), dati['Longitude'].to_numpy(), identity, acc)
 
-    return dati
+    return dati[keep]
 
 #-----------------------------------------------------------------------
 # Funzione per rimuovere i punti se sono sulla media degli altri due
 #-----------------------------------------------------------------------
 
-def rem_median(dati, acc = 4):
+def median_mask(lat, lon, acc = 4, bound = None):
+
+    """Maschera dei punti da tenere secondo il metodo della media.
+
+    A partire dagli array di latitudine e longitudine, restituisce un array booleano che vale True per i
+    punti da tenere. I punti sono considerati a tre a tre (A, B, C), dove A è l'ultimo punto rimasto
+    ("puntatore" al sopravvissuto precedente) e B, C sono consecutivi: se B viene tolto, A resta fermo e
+    C avanza; altrimenti B diventa il nuovo A. Così si ottiene lo stesso risultato della rimozione in-place,
+    ma in tempo lineare e senza copiare i dati a ogni rimozione.
+    bound (facoltativo) è un DeviationBound: B viene tolto solo se i punti originali tra A e C restano
+    entro lo scarto massimo dalla retta AC.
+    """
+
+    lat = np.asarray(lat, dtype = float)
+    lon = np.asarray(lon, dtype = float)
+
+    n = len(lat)
+    keep = np.ones(n, dtype = bool)
+
+    if n < 3:
+        return keep
+
+    # Coordinate come liste (accesso scalare veloce) e punti da confrontare già arrotondati.
+    # La media viene arrotondata come fa numpy: rint(x*10^acc)/10^acc.
+    f = 10.0**acc
+    x = lat.tolist()
+    y = lon.tolist()
+    testx = np.round(lat, acc).tolist()
+    testy = np.round(lon, acc).tolist()
+
+    a = 0
+    for b in range(1, n-1):
+        c = b + 1
+        if round((x[a] + x[c])/2*f)/f == testx[b] and round((y[a] + y[c])/2*f)/f == testy[b] \
+                and (bound is None or bound.allows(a, c)):
+            keep[b] = False
+        else:
+            a = b
+
+    return keep
+
+
+def rem_median(dati, acc = 4, max_deviation_meter = None):
 
     """Rimuove un punto se è sulla media degli altri due.
     
     A partire da un dataframe di Pandas per cui c'è una colonna che si chiama 'Latitude' e una che si chiama 
     'Longitude', questa funzione considera i punti a tre a tre (A, B, C): se B è la media degli altri due, 
     lo si rimuove. Il primo argomento sono i dati nel formato sopra, poi acc indica entro quante cifre 
-    decimali la media deve essere uguale,infine inplace indica se i punti vanno rimossi 'in place', 
-    oppure a parte in seguito.
+    decimali la media deve essere uguale.
     Valori consigliati per l'accuratezza: 4 (valore predefinito).
+    Con max_deviation_meter (in metri) un punto viene tolto solo se i punti tolti restano entro questa
+    distanza dal segmento che li sostituisce (vedi DeviationBound).
     NOTA: condizioni al contorno necessarie, da porre FUORI dal dataset.
     """
 
-    i = 0
-    end = len(dati)-2
-    
-    while i < end:
-        
-        values = dati[i:i+3]
-
-        # Condizione di uscita dovuta alla rimozione dei punti in-place
-        if len(values) < 3:
-            return dati
-        
-        # Calcolo latitudine e longitudine media
-        medLat = (values.iloc[0]['Latitude'] + values.iloc[2]['Latitude'])/2
-        medLong = (values.iloc[0]['Longitude'] + values.iloc[2]['Longitude'])/2
-
-        # Latitudine e longitudine da confrontare
-        testLat = values.iloc[1]['Latitude']
-        testLong = values.iloc[1]['Longitude']
-            
-        if round(medLat, acc) == round(testLat,acc) and round(medLong, acc) == round(testLong, acc):
-            dati = dati.drop(values.iloc[1].name, axis = 0)
-            end = end - 1
-        else:
-            i = i+1
+    lat = dati['Latitude'].to_numpy()
+    lon = dati['Longitude'].to_numpy()
+
+    keep = median_mask(lat, lon, acc, deviation_bound(lat, lon, max_deviation_meter))
 
-    return dati
+    return dati[keep]
 
 
 #---------------------------------------------------------------------
 # Funzione per rimuovere i punti se sono nel buffer degli altri due
 #---------------------------------------------------------------------
 
-def rem_buffer(dati, tol_meter = 10):
+def segment_dist2(ax, ay, bx, by, cx, cy):
+
+    """Distanza al quadrato tra il punto B e il segmento AC.
+
+    Formula chiusa: proietto B sulla retta AC, limito la proiezione al segmento (parametro t tra 0 e 1)
+    e calcolo la distanza al quadrato tra B e il punto proiettato. Se A e C coincidono, è la distanza
+    al quadrato tra B e A. Funziona sia con scalari sia con array di numpy.
+    """
+
+    dx = cx - ax
+    dy = cy - ay
+    den = dx*dx + dy*dy
+    num = (bx - ax)*dx + (by - ay)*dy
+
+    if np.ndim(den) == 0:
+        t = min(max(num/den, 0.0), 1.0) if den > 0 else 0.0
+    else:
+        t = np.clip(np.divide(num, den, out = np.zeros_like(num), where = den > 0), 0.0, 1.0)
+
+    ex = bx - (ax + t*dx)
+    ey = by - (ay + t*dy)
+
+    return ex*ex + ey*ey
+
+
+def buffer_mask(lat, lon, tol, bound = None):
+
+    """Maschera dei punti da tenere secondo il metodo del buffer.
+
+    A partire dagli array di latitudine e longitudine e dalla tolleranza tol (in GRADI), restituisce un
+    array booleano che vale True per i punti da tenere. I punti sono considerati a tre a tre (A, B, C)
+    con le stesse regole di avanzamento di rem_median: B viene tolto se la sua distanza dal segmento AC
+    è minore di tol, cioè se si trova all'interno del buffer (con estremità arrotondate) di AC.
+    Le distanze per le terne consecutive vengono calcolate tutte insieme; solo dopo una rimozione,
+    quando A non è più il punto precedente a B, la distanza viene ricalcolata.
+    bound (facoltativo) è un DeviationBound: B viene tolto solo se i punti originali tra A e C restano
+    entro lo scarto massimo dalla retta AC.
+    """
+
+    lat = np.asarray(lat, dtype = float)
+    lon = np.asarray(lon, dtype = float)
+
+    n = len(lat)
+    keep = np.ones(n, dtype = bool)
+
+    if n < 3:
+        return keep
+
+    tol2 = tol*tol
+
+    # Distanze per le terne consecutive (A = punto precedente a B)
+    inside = (segment_dist2(lat[:-2], lon[:-2], lat[1:-1], lon[1:-1], lat[2:], lon[2:]) < tol2).tolist()
+
+    x = lat.tolist()
+    y = lon.tolist()
+
+    a = 0
+    for b in range(1, n-1):
+        c = b + 1
+        if a == b - 1:
+            remove = inside[a]
+        else:
+            remove = segment_dist2(x[a], y[a], x[b], y[b], x[c], y[c]) < tol2
+        if remove and bound is not None:
+            remove = bound.allows(a, c)
+        if remove:
+            keep[b] = False
+        else:
+            a = b
+
+    return keep
+
+
+def rem_buffer(dati, tol_meter = 10, max_deviation_meter = None):
 
     """Rimuove un punto se è sul buffer degli altri due.
     
@@ -116,10 +311,11 @@ def rem_buffer(dati, tol_meter = 10):
     altri due, lo si rimuove. 
     "Trovarsi nel buffer" significa che traccio la linea tra A e C, e considero un buffer geometrico attorno
     a questa linea; se B si trova all'interno di questo buffer, "si trova nel buffer" e quindi verrà
-    eliminato.
-    Il primo argomento sono i dati nel formato sopra, poi tol indica quanto deve essere grande il buffer,
-    infine inplace indica se i punti vanno rimossi 'in place', oppure a parte in seguito.
+    eliminato. Il test è fatto in forma chiusa, con la distanza punto-segmento (vedi buffer_mask).
+    Il primo argomento sono i dati nel formato sopra, poi tol indica quanto deve essere grande il buffer.
     Valori consigliati per la tolleranza: 10m (valore predefinito). 
+    Con max_deviation_meter (in metri) un punto viene tolto solo se i punti tolti restano entro questa
+    distanza dal segmento che li sostituisce (vedi DeviationBound).
     NOTA: condizioni al contorno periodiche necessarie, da porre FUORI dal dataset.
     """
 
@@ -127,31 +323,9 @@ def rem_buffer(dati, tol_meter = 10):
     radius = 6371000
     tol = 360*tol_meter/(2*math.pi*radius)
 
-    i = 0
-    end = len(dati)-2
-    
-    while i < end:
-        
-        values = dati[i:i+3]
-
-        # Condizione di uscita dovuta alla rimozione dei punti in-place
-        if len(values) < 3:
-            return(dati)
-        
-        # Calcolo linea e punto corrispondente
-        line = LineString([
-            (values.iloc[0]['Latitude'], values.iloc[0]['Longitude']), 
-            (values.iloc[2]['Latitude'], values.iloc[2]['Longitude'])
-        ])
-        point = Point(values.iloc[1]['Latitude'], values.iloc[1]['Longitude'])
-        
-        # Estendo la linea
-        line = line.buffer(tol)    
-            
-        if point.within(line):
-            dati = dati.drop(values.iloc[1].name, axis = 0)
-            end = end - 1
-        else:
-            i = i+1
-        
-    return dati
\ No newline at end of file
+    lat = dati['Latitude'].to_numpy()
+    lon = dati['Longitude'].to_numpy()
+
+    keep = buffer_mask(lat, lon, tol, deviation_bound(lat, lon, max_deviation_meter))
+
+    return dati[keep]
@@ -3,16 +3,16 @@ from GeoSampling import ObjFunZoom as z
 from GeoSampling import DBSCANsampling as dbsamp
 from GeoSampling import RemovingPoints as rp
 from GeoSampling import RemovingLength as rl
+from GeoSampling import RemovingArea as ra
 
 # Help modules
 from GeoSampling import Periodics as pcs
-from GeoSampling import PlotFunctions as pl
+from GeoSampling import Instrumentation as ins
+from GeoSampling import Metrics as mtr
 
 # New modules
 import math
 import numpy as np
-from numpy.linalg import norm
-import seaborn as sns
 
 #------------------------------------------------
 # Funzione di sampling
@@ -21,141 +21,419 @@ import seaborn as sns
 def Sampling(dati, detail = 10, par_identity = False,
         clustering = False, ifzoom = False, par_zoomed = 0.5,
         par_buffer = 0.5, par_length = 2,
-        finelength = True, minPoints = 4, analysis = False):
+        finelength = True, minPoints = 4, analysis = False, cache = None, hooks = None,
+        visvalingam = False, par_area = 0.5, max_points = None, max_deviation_meter = None,
+        memory = False):
 
     """Funzione di sampling di un poligono.
 
     Funzione che, dato un set di dati rappresentanti un poligono, 
     effettua un sampling dei suoi punti con l'obiettivo di ridurre il numero di punti
     con una perdita accettabile in termini di area e di scarto massimo. 
+    I dati possono essere un dataframe di Pandas oppure una vista (PolygonView) di un PolygonStore.
+    Gli step del sampling sono elencati da sampling_stages ed eseguiti da run_stages.
+    cache (facoltativo) è una StageCache.StageCache: gli step già calcolati sugli stessi punti con
+    gli stessi parametri vengono letti dalla cache.
+    hooks (facoltativo) è una lista di funzioni che ricevono il record di ogni step (vedi run_stages
+    e Instrumentation); se dati è una PolygonView, i record contengono il suo ID_EXT. Con memory = True
+    i record contengono anche il picco di memoria di ogni step, ma i tempi non sono attendibili.
+    visvalingam = True sostituisce i metodi della media, del buffer e dei segmenti corti con un unico
+    passaggio del metodo di Visvalingam-Whyatt (RemovingArea), con area minima par_area*detail^2
+    in metri quadrati.
+    max_points (facoltativo) è il numero massimo di punti del risultato: in questo caso detail è solo il
+    punto di partenza, e il dettaglio viene cercato con budget_detail (il più piccolo, a meno dell'1%,
+    che rispetta il limite). Il dettaglio trovato e il report di qualità (Metrics.quality_report) sono
+    restituiti negli attributi del dataframe: sampled.attrs['detail'] e sampled.attrs['quality'].
+    Con analysis = True l'analisi (analysisFunction) è fatta sugli step del dettaglio trovato.
+    max_deviation_meter (facoltativo, in metri) è lo scarto massimo ammesso: i metodi della media, del
+    buffer, dei segmenti corti e di Visvalingam-Whyatt non tolgono un punto se un punto originale tolto
+    finirebbe più lontano di così dal segmento che lo sostituisce (RemovingPoints.DeviationBound).
+    Il limite non si applica ai punti tolti dal metodo dei punti sovrapposti e dal clustering.
     """
 
     # Reset dei dati (per le successive funzioni)
-    orig_dati = pcs.reset_data(dati)
+    # Da qui in poi il poligono è un Ring: si torna a un dataframe solo alla fine
+    orig_dati = pcs.reset_data(pcs.as_frame(dati))
+    orig_ring = pcs.Ring.from_frame(orig_dati)
 
-    #------------------------------------------------------
-    # Rimozione dei punti sovrapposti
-    # Sì condizioni al contorno (metto prima, tolgo dopo)
-    #------------------------------------------------------
-    dati_overlap = pcs.PC(orig_dati)
-    dati_overlap = rp.rem_overlap(dati_overlap, par_identity)
-    dati_overlap = pcs.RC(dati_overlap)
+    params = {'par_identity': par_identity, 'clustering': clustering, 'ifzoom': ifzoom,
+              'par_zoomed': par_zoomed, 'par_buffer': par_buffer, 'par_length': par_length,
+              'finelength': finelength, 'visvalingam': visvalingam, 'par_area': par_area,
+              'max_deviation_meter': max_deviation_meter}
 
-    if analysis:
-        analysisFunction(dati_overlap, 'Metodo dei punti sovrapposti')
+    # Limite sul numero di punti: ricerca del dettaglio
+    if max_points is not None:
+        detail, sampled = budget_detail(orig_ring, max_points, detail, minPoints, cache = cache,
+                                        hooks = hooks, polygon = getattr(dati, 'id_ext', None),
+                                        memory = memory, **params)
+        # Analisi degli step con il dettaglio trovato (le prove della ricerca non vengono mostrate)
+        if analysis:
+            run_stages(orig_ring, sampling_stages(detail, minPoints = minPoints, **params), minPoints,
+                       analysis, cache = cache)
+        sampled = sampled.to_frame()
+        sampled.attrs['detail'] = detail
+        sampled.attrs['quality'] = mtr.quality_report(dati, sampled, detail)
+        return sampled
+
+    stages = sampling_stages(detail, minPoints = minPoints, **params)
+
+    sampled = run_stages(orig_ring, stages, minPoints, analysis, cache = cache,
+                         hooks = hooks, polygon = getattr(dati, 'id_ext', None), memory = memory)
+
+    return sampled.to_frame()
+
+
+#-------------------------------------------------
+# Ricerca del dettaglio per un numero massimo di punti
+#-------------------------------------------------
+
+def budget_detail(ring, max_points, detail = 10, minPoints = 4, rtol = 0.01, min_detail = 0.01,
+                  max_detail = 1e7, memo = None, cache = None, hooks = None, polygon = None,
+                  memory = False, **params):
+
+    """Dettaglio più piccolo per cui il sampling lascia al massimo max_points punti
+
+    A partire da detail, raddoppia (o dimezza) il dettaglio finché non trova due valori, uno con più di
+    max_points punti e uno con al massimo max_points punti, e poi fa una bisezione (geometrica) tra i
+    due, finché il loro rapporto è minore di 1 + rtol. Tutte le prove usano la stessa memoria di
+    run_stages (memo), quindi gli step che non dipendono dal dettaglio (punti sovrapposti, media)
+    sono calcolati una volta sola. params sono gli altri parametri di sampling_stages.
+    Il numero di punti NON è monotono nel dettaglio: con un dettaglio troppo grande uno step lascia meno
+    di minPoints punti e viene ignorato (fallback), e i punti aumentano. Per questo una prova con un
+    fallback (di uno step che dipende dal dettaglio, vedi sampling_stages) e più di max_points punti conta
+    come dettaglio troppo grande: la ricerca verso l'alto si ferma e la bisezione continua sotto quel
+    dettaglio.
+    Restituisce il dettaglio trovato e il Ring campionato. Se anche con min_detail i punti sono al massimo
+    max_points, restituisce min_detail; se nessuna prova scende a max_points punti (per esempio perché
+    max_points è minore di minPoints), restituisce il risultato con meno punti tra quelli provati.
+    """
+
+    memo = {} if memo is None else memo
+    tried = []
+
+    def run(detail):
+        stages = sampling_stages(detail, minPoints = minPoints, **params)
+        fallbacks = []
+        sampled = run_stages(ring, stages, minPoints, memo = memo, cache = cache,
+                             hooks = hooks, polygon = polygon, memory = memory, fallbacks = fallbacks)
+        tried.append((detail, sampled))
+        # Contano solo gli step che dipendono dal dettaglio (non i punti sovrapposti o la media)
+        dependent = {stage[0] for stage in stages if stage[4]}
+        return sampled, any(name in dependent for name in fallbacks)
+
+    def best():
+        # Il risultato con meno punti (a parità, il dettaglio più piccolo) tra quelli provati
+        return min(tried, key = lambda trial: (len(trial[1]), trial[0]))
+
+    sampled, fallback = run(detail)
+
+    # Ricerca di un intervallo [low, high]: con low i punti sono più di max_points, con high
+    # sono al massimo max_points (found = True) oppure uno step è stato ignorato (found = False)
+    if len(sampled) <= max_points:
+        high, high_ring, found = detail, sampled, True
+        low = detail
+        while True:
+            if low <= min_detail:
+                return high, high_ring
+            low = max(low/2, min_detail)
+            low_ring, fallback = run(low)
+            if len(low_ring) > max_points:
+                break
+            high, high_ring = low, low_ring
+    elif fallback:
+        low, high, high_ring, found = min_detail, detail, sampled, False
+    else:
+        low = detail
+        high, high_ring = detail, sampled
+        while len(high_ring) > max_points and not fallback:
+            if high >= max_detail:
+                return best()
+            low = high
+            high = min(2*high, max_detail)
+            high_ring, fallback = run(high)
+        found = len(high_ring) <= max_points
+
+    # Bisezione geometrica
+    while high > low*(1 + rtol):
+        middle = math.sqrt(low*high)
+        middle_ring, fallback = run(middle)
+        if len(middle_ring) <= max_points:
+            high, high_ring, found = middle, middle_ring, True
+        elif fallback and not found:
+            high, high_ring = middle, middle_ring
+        else:
+            low = middle
+
+    if not found:
+        return best()
+
+    return high, high_ring
 
-    if len(dati_overlap) < minPoints:
-        dati_overlap = orig_dati
-    
-    #----------------------------------------------------
-    # FACOLTATIVO: Metodi basati sul clustering
-    # No condizioni al contorno
-    #----------------------------------------------------
 
+#-------------------------------------------------
+# Step del sampling
+#-------------------------------------------------
+
+def sampling_stages(detail = 10, par_identity = False,
+        clustering = False, ifzoom = False, par_zoomed = 0.5,
+        par_buffer = 0.5, par_length = 2, finelength = True, visvalingam = False, par_area = 0.5,
+        max_deviation_meter = None, minPoints = 4):
+
+    """Elenco degli step del sampling
+
+    Con gli stessi parametri di Sampling, restituisce la lista degli step da eseguire, nell'ordine:
+    ogni step è una cinquina (nome, titolo, funzione, parametri, dettaglio), dove la funzione riceve un
+    Ring e i parametri (un dizionario) e restituisce un nuovo Ring, e dettaglio vale True se i parametri
+    dipendono da detail (per budget_detail). I parametri sono già quelli effettivi (per esempio le soglie
+    in metri), quindi due step con lo stesso nome e gli stessi parametri, applicati allo stesso Ring,
+    danno lo stesso risultato.
+    Con visvalingam = True, dopo i punti sovrapposti (e l'eventuale clustering) c'è un solo step, il
+    metodo di Visvalingam-Whyatt con area minima par_area*detail^2 (con i valori predefiniti è l'area del
+    triangolo con base la lunghezza minima dei segmenti e altezza la tolleranza del buffer), che si ferma
+    quando restano minPoints punti (altrimenti run_stages ignorerebbe tutto lo step).
+    max_deviation_meter è passato a tutti gli step dopo i punti sovrapposti e il clustering.
+    """
+
+    stages = [('overlap', 'Metodo dei punti sovrapposti', stage_overlap, {'identity': par_identity}, False)]
+
+    # FACOLTATIVO: Metodi basati sul clustering
     if clustering:
-        
-        # Metodo del clustering basato sulla mia funzione personale
         if ifzoom:
+            stages.append(('zoom', 'Metodo dello zoom', stage_zoom, {'d_meter': par_zoomed*detail}, True))
+        else:
+            stages.append(('dbscan', 'Metodo DBSCAN', stage_dbscan, {'eps_meter': par_zoomed*detail}, True))
 
-            zoomed = z.ObjFunZoom(dati_overlap, d_meter = par_zoomed*detail)
+    bound = {'max_deviation_meter': max_deviation_meter}
 
-            if analysis:
-                analysisFunction(zoomed, 'Metodo dello zoom')
+    if visvalingam:
+        stages.append(('visvalingam', 'Metodo di Visvalingam-Whyatt', stage_visvalingam,
+                       {'area_meter2': par_area*detail**2, 'min_points': minPoints, **bound}, True))
+        return stages
 
-            if len(zoomed) < minPoints:
-                zoomed = dati_overlap
+    stages.append(('median', 'Metodo della media', stage_median, {**bound}, False))
+    stages.append(('buffer', 'Metodo del buffer', stage_buffer,
+                   {'tol_meter': detail*par_buffer, **bound}, True))
 
-        # Metodo del clustering basato sul DBSCAN
-        else:
+    if finelength:
+        stages.append(('finelength', 'Metodo della lunghezza dei segmenti', stage_finelength,
+                       {'lenmin_meter': par_length*detail, **bound}, True))
+    else:
+        stages.append(('length', 'Metodo della lunghezza dei segmenti', stage_length,
+                       {'lenmin_meter': par_length*detail, **bound}, True))
+
+    # Correzione: ulteriore applicazione del metodo del buffer
+    stages.append(('buffer', 'Metodo del buffer: seconda applicazione', stage_buffer,
+                   {'tol_meter': detail*par_buffer, **bound}, True))
 
-            zoomed = dbsamp.DBSCANsampling(dati_overlap, eps_meter = par_zoomed * detail)
+    return stages
+
+
+def stage_key(stage):
+
+    """Chiave di uno step: il nome e i parametri (ordinati)."""
+
+    name, title, function, params, dependent = stage
+    return (name, tuple(sorted(params.items())))
+
+
+def run_stages(ring, stages, minPoints = 4, analysis = False, memo = None, cache = None,
+               hooks = None, polygon = None, memory = False, fallbacks = None):
+
+    """Esecuzione degli step del sampling
+
+    Applica al Ring gli step nell'ordine; se uno step lascia meno di minPoints punti, lo step
+    viene ignorato (si tiene il Ring precedente).
+    memo (facoltativo) è un dizionario che associa a ogni sequenza di step già eseguita (le chiavi
+    degli step, a partire dallo stesso Ring) il Ring ottenuto e i nomi degli step ignorati fino a lì:
+    gli step già calcolati non vengono ripetuti, e i nuovi risultati vengono aggiunti al dizionario.
+    cache (facoltativo) è una StageCache.StageCache: prima di eseguire uno step si cerca il suo
+    risultato nella cache (a partire dalle coordinate dei punti in ingresso e dai parametri).
+    hooks (facoltativo) è una lista di funzioni (per esempio i sink di Instrumentation) che ricevono,
+    per ogni step eseguito, un record con nome, parametri, punti in ingresso e in uscita, tempi, picco
+    di memoria (solo se memory = True, altrimenti None) e l'indicazione del fallback (vedi
+    Instrumentation.StageMeter); polygon è l'identificativo del poligono da scrivere nei record.
+    Gli step letti da memo non producono record.
+    fallbacks (facoltativo) è una lista a cui vengono aggiunti i nomi degli step ignorati (anche
+    quelli letti da memo).
+    """
+
+    meter = ins.StageMeter(memory) if hooks else None
+    prefix = (minPoints,)
+    ignored = ()
+
+    try:
+        for stage in stages:
+
+            name, title, function, params, dependent = stage
+            prefix = prefix + (stage_key(stage),)
+
+            if memo is not None and prefix in memo:
+                ring, ignored = memo[prefix]
+                continue
+
+            if meter is not None:
+                meter.start()
+
+            if cache is not None:
+                new_ring = cache.run(ring, stage)
+            else:
+                new_ring = function(ring, **params)
+
+            fallback = len(new_ring) < minPoints
+
+            if meter is not None:
+                ins.emit(hooks, meter.stop(stage, len(ring), len(new_ring), fallback, polygon))
 
             if analysis:
-                analysisFunction(zoomed, 'Metodo DBSCAN')
+                analysisFunction(new_ring.to_frame(), title)
 
-            if len(zoomed) < minPoints:
-                zoomed = dati_overlap
+            # Pochi punti: ignoro lo step
+            if not fallback:
+                ring = new_ring
+            else:
+                ignored = ignored + (name,)
 
-    else:
-        
-        zoomed = dati_overlap
+            if memo is not None:
+                memo[prefix] = (ring, ignored)
 
-    #------------------------------------------------------
-    # Metodo della media (soglia fissa)
-    # Sì condizioni al contorno (metto prima, tolgo dopo)
-    #------------------------------------------------------
+    finally:
+        if meter is not None:
+            meter.close()
 
-    dati_media = pcs.PC(zoomed)
-    dati_media = rp.rem_median(dati_media)
-    dati_media = pcs.RC(dati_media)
+    if fallbacks is not None:
+        fallbacks.extend(ignored)
 
-    if analysis:
-        analysisFunction(dati_media, 'Metodo della media')
+    return ring
 
-    if len(dati_media) < minPoints:
-        dati_media = zoomed
 
-    #----------------------------------------------------------
-    # Metodo del buffer (soglia dipendente dal dettaglio)
-    # Sì condizioni al contorno (metto prima, tolgo dopo)
-    #-----------------------------------------------------------
+#------------------------------------------------------
+# Rimozione dei punti sovrapposti
+# Sì condizioni al contorno (periodic, poi unpad)
+#------------------------------------------------------
 
-    dati_buffer = pcs.PC(dati_media)
-    dati_buffer = rp.rem_buffer(dati_buffer, tol_meter = detail*par_buffer)
-    dati_buffer = pcs.RC(dati_buffer)
+def stage_overlap(ring, identity = False):
+    return ring.unpad(rp.overlap_mask(*ring.periodic(), identity))
 
-    if analysis:
-        analysisFunction(dati_buffer, 'Metodo del buffer')
+#----------------------------------------------------
+# FACOLTATIVO: Metodi basati sul clustering
+# No condizioni al contorno
+#----------------------------------------------------
 
-    # Pochi punti: ignoro lo step
-    if len(dati_buffer) < minPoints:
-        dati_buffer = dati_media
-    
-    #---------------------------------------------------------------
-    # Metodo dei segmenti corti (soglia dipendente dal dettaglio)
-    # Sì condizioni al contorno (metto prima, tolgo dopo)
-    #---------------------------------------------------------------
+def stage_zoom(ring, d_meter = 5):
 
-    dati_corti = pcs.PC(dati_buffer)
+    # Metodo del clustering basato sulla mia funzione personale
+    zoomed = z.ObjFunZoom(ring.to_frame(), d_meter = d_meter)
+    return ring.select(zoomed.index)
 
-    if finelength:
-        dati_corti = rl.rem_finelength(dati_corti, lenmin_meter = par_length*detail)
-    else:
-        dati_corti = rl.rem_length(dati_corti, lenmin_meter = par_length*detail)
+def stage_dbscan(ring, eps_meter = 5):
 
-    dati_corti = pcs.RC(dati_corti)
+    # Metodo del clustering basato sul DBSCAN
+    zoomed = dbsamp.DBSCANsampling(ring.to_frame(), eps_meter = eps_meter)
+    return ring.select(zoomed.index)
 
-    if analysis:
-        analysisFunction(dati_corti, 'Metodo della lunghezza dei segmenti')
+#------------------------------------------------------
+# Metodo della media (soglia fissa)
+# Sì condizioni al contorno (periodic, poi unpad)
+#------------------------------------------------------
 
-    if len(dati_corti) < minPoints:
-        dati_corti = dati_buffer
+def stage_median(ring, max_deviation_meter = None):
+    return ring.unpad(rp.median_mask(*ring.periodic(), bound = deviation_bound(ring, max_deviation_meter)))
 
-    #---------------------------------------------------------------
-    # Correzione: ulteriore applicazione del metodo del buffer
-    #---------------------------------------------------------------
+#----------------------------------------------------------
+# Metodo del buffer (soglia dipendente dal dettaglio)
+# Sì condizioni al contorno (periodic, poi unpad)
+#-----------------------------------------------------------
+
+def stage_buffer(ring, tol_meter = 5, max_deviation_meter = None):
+
+    # Conversione da metri a gradi della tolleranza
+    radius = 6371000
+    tol = 360*tol_meter/(2*math.pi*radius)
+
+    return ring.unpad(rp.buffer_mask(*ring.periodic(), tol, deviation_bound(ring, max_deviation_meter)))
+
+#---------------------------------------------------------------
+# Metodo dei segmenti corti (soglia dipendente dal dettaglio)
+# Sì condizioni al contorno (periodic, poi unpad)
+#---------------------------------------------------------------
+
+def stage_finelength(ring, lenmin_meter = 20, max_deviation_meter = None):
+
+    # Da metri a gradi
+    radius = 6371000
+    lenmin = 360*lenmin_meter/(2*math.pi*radius)
 
-    dati_buffer_2 = pcs.PC(dati_corti)
-    dati_buffer_2 = rp.rem_buffer(dati_buffer_2, tol_meter = detail*par_buffer)
-    dati_buffer_2 = pcs.RC(dati_buffer_2)
+    return ring.unpad(rl.finelength_mask(*ring.periodic(), lenmin, deviation_bound(ring, max_deviation_meter)))
 
-    if analysis:
-        analysisFunction(dati_buffer_2, 'Metodo del buffer: seconda applicazione')
+def stage_length(ring, lenmin_meter = 20, max_deviation_meter = None):
 
-    if len(dati_buffer_2) < minPoints:
-        dati_buffer_2 = dati_corti
+    # Da metri a gradi
+    radius = 6371000
+    lenmin = 360*lenmin_meter/(2*math.pi*radius)
 
-    #----------------------------------
-    # Fine sampling
-    #-----------------------------------
+    return ring.unpad(rl.length_mask(*ring.periodic(), lenmin, deviation_bound(ring, max_deviation_meter)))
 
-    return dati_buffer_2
+#---------------------------------------------------------------
+# Metodo di Visvalingam-Whyatt (soglia dipendente dal dettaglio)
+# No condizioni al contorno (il poligono è già ciclico)
+#---------------------------------------------------------------
+
+def stage_visvalingam(ring, area_meter2 = 50, min_points = 3, max_deviation_meter = None):
+
+    # Da metri quadrati a gradi quadrati
+    radius = 6371000
+    area_min = area_meter2*(360/(2*math.pi*radius))**2
+
+    bound = deviation_bound(ring, max_deviation_meter, periodic = False)
+    return ring.take(ra.visvalingam_mask(*ring.coords(), area_min, min_points, bound))
+
+#---------------------------------------------------------------
+# Scarto massimo dei punti originali tolti
+#---------------------------------------------------------------
+
+def deviation_bound(ring, max_deviation_meter = None, periodic = True):
+
+    """Limite allo scarto (RemovingPoints.DeviationBound) per un metodo applicato al Ring
+
+    Il limite controlla tutti i punti originali del Ring (anche quelli tolti dagli step precedenti).
+    periodic indica se il metodo riceve i dati con le condizioni periodiche (ring.periodic()) oppure
+    solo i punti rimasti (ring.coords()). Restituisce None se max_deviation_meter è None.
+    """
+
+    if max_deviation_meter is None:
+        return None
+
+    # Da metri a gradi
+    radius = 6371000
+    max_dev = 360*max_deviation_meter/(2*math.pi*radius)
+
+    pos = ring.periodic_positions() if periodic else ring.idx
+    return rp.DeviationBound(ring.lat, ring.lon, pos, max_dev, periodic)
 
 
 #-------------------------------------------------
 # Funzione di dettaglio
 #-------------------------------------------------
 
+def segment_meters(dati):
+
+    """Lunghezze (in metri) dei segmenti del poligono usate per il dettaglio
+
+    A partire dai dati nel formato di input (dataframe oppure PolygonView), restituisce l'array delle
+    lunghezze in metri dei segmenti tra punti consecutivi, calcolate tutte insieme, tranne l'ultimo
+    segmento (come è sempre stato fatto in r_detailq).
+    """
+
+    dati = pcs.as_frame(dati)
+
+    distances = rl.segment_lengths(dati['Latitude'].to_numpy(), dati['Longitude'].to_numpy())
+    distances = distances[:max(len(dati)-2, 0)]
+
+    # Distanze in metri
+    radius = 6371000
+    return 2*math.pi*radius*distances/360
+
+
 def r_detailq(dati, q = 0.15):
 
     """Calcolare il dettaglio "buono" a partire da un insieme di dati
@@ -163,19 +441,11 @@ def r_detailq(dati, q = 0.15):
     Questa funzione calcola il dettaglio "buono" (quello che restituisce una buona approssimazione
     della funzione vera) a partire dai punti. Lo calcolo così: calcolo tutte le distanze, e poi prendo il
     quantile 0.15 della funzione vera.
+    I dati possono essere un dataframe di Pandas oppure una vista (PolygonView) di un PolygonStore.
     """
 
     # Elenco delle distanze
-    
-    distances = []
-
-    for i in range(0, len(dati)-2):
-        A = dati.iloc[i].to_numpy()
-        B = dati.iloc[i+1].to_numpy()
-        distance = norm(A-B)
-        radius = 6371000
-        distance_meter = 2*math.pi*radius*distance/360 #Distanze in metri
-        distances.append(distance_meter)
+    distances = segment_meters(dati)
 
     detail = math.floor(np.quantile(distances, q))
 
@@ -184,13 +454,114 @@ def r_detailq(dati, q = 0.15):
     
     return detail
 
+
+#-------------------------------------------------
+# Dettaglio globale su tutto il database
+#-------------------------------------------------
+
+class DetailSketch:
+
+    """Stima in streaming del quantile delle lunghezze dei segmenti
+
+    Per scegliere un dettaglio globale su tutto il database senza tenere in memoria tutte le lunghezze
+    dei segmenti. Le lunghezze (in metri) vengono contate in intervalli con estremi in progressione
+    geometrica di ragione gamma = (1+alpha)/(1-alpha): il quantile stimato ha un errore relativo al più
+    alpha, e la memoria dipende solo dal rapporto tra la lunghezza più grande e la più piccola
+    (circa 800 intervalli da 1cm a 100km con alpha = 0.01).
+    Due sketch con lo stesso alpha si possono unire con merge (per esempio uno per ogni processo).
+    """
+
+    def __init__(self, alpha = 0.01):
+
+        self.alpha = alpha
+        self.log_gamma = math.log((1 + alpha)/(1 - alpha))
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+
+    def update(self, values):
+
+        """Aggiunge allo sketch un array di lunghezze (in metri)."""
+
+        values = np.asarray(values, dtype = float)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+
+        keys, counts = np.unique(np.ceil(np.log(positive)/self.log_gamma).astype(int), return_counts = True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+        self.zeros = self.zeros + len(values) - len(positive)
+        self.count = self.count + len(values)
+
+        return self
+
+    def add_polygon(self, dati):
+
+        """Aggiunge allo sketch le lunghezze dei segmenti di un poligono (come in r_detailq)."""
+
+        return self.update(segment_meters(dati))
+
+    def merge(self, other):
+
+        """Unisce a questo sketch un altro sketch con lo stesso alpha."""
+
+        if other.alpha != self.alpha:
+            raise Exception("Gli sketch da unire devono avere lo stesso alpha")
+
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+        self.zeros = self.zeros + other.zeros
+        self.count = self.count + other.count
+
+        return self
+
+    def quantile(self, q):
+
+        """Quantile q (stimato) delle lunghezze aggiunte finora."""
+
+        if self.count == 0:
+            raise Exception("Lo sketch è vuoto")
+
+        rank = q*(self.count - 1)
+
+        if rank < self.zeros:
+            return 0.0
+
+        cumulative = self.zeros
+        for key in sorted(self.buckets):
+            cumulative = cumulative + self.buckets[key]
+            if cumulative > rank:
+                break
+
+        # Valore rappresentativo dell'intervallo (gamma^(key-1), gamma^key]
+        return 2*math.exp(key*self.log_gamma)/(math.exp(self.log_gamma) + 1)
+
+    def detail(self, q = 0.15):
+
+        """Dettaglio globale, calcolato come in r_detailq ma sul quantile stimato."""
+
+        detail = math.floor(self.quantile(q))
+
+        if detail == 0:
+            detail = 0.01
+
+        return detail
+
 #----------------------------------------------------
 # Funzione per testare i risultati del sampling
 #-----------------------------------------------------
 
 def analysisFunction(dati, title):
 
-    """Funzioni di test da aggiungere eventualmente alla provaSampling"""
+    """Funzioni di test da aggiungere eventualmente alla provaSampling
+
+    PlotFunctions (e quindi Matplotlib) viene importato solo qui, così che il sampling non dipenda
+    dalle librerie grafiche.
+    """
+
+    from GeoSampling import PlotFunctions as pl
 
     print(title, len(dati))
     pl.plot_polygon(dati, title)
\ No newline at end of file
@@ -0,0 +1,147 @@
+#************************************************************************************
+# Questo file contiene la cache dei risultati degli step del sampling
+#************************************************************************************
+
+from GeoSampling import Sampling as samp
+
+from collections import OrderedDict
+import hashlib
+import os
+import numpy as np
+
+#-----------------------------------------------------
+# Cache degli step del sampling
+#-----------------------------------------------------
+
+class StageCache:
+
+    """Cache dei risultati degli step del sampling
+
+    La chiave di un risultato è un hash delle coordinate dei punti in ingresso allo step, del nome dello
+    step e dei suoi parametri (Sampling.stage_key): se lo stesso poligono, non modificato, viene campionato
+    di nuovo con gli stessi parametri, gli step non vengono ricalcolati. Se lo step ha un limite allo
+    scarto (max_deviation_meter), il risultato dipende anche dai punti originali già tolti: in questo
+    caso la chiave comprende anche tutte le coordinate originali e le posizioni dei punti rimasti.
+    Il valore salvato è l'elenco delle posizioni (tra i punti in ingresso) dei punti rimasti dopo lo step.
+    La cache ha due livelli:
+    - in memoria, con al massimo maxsize risultati (si elimina quello usato meno di recente, LRU);
+    - facoltativo, su disco nella cartella path, con al massimo max_bytes byte (si eliminano i file
+      usati meno di recente).
+    I contatori hits, disk_hits e misses indicano quante volte un risultato è stato trovato in memoria,
+    trovato su disco, oppure calcolato.
+    """
+
+    def __init__(self, maxsize = 1024, path = None, max_bytes = 100*2**20):
+
+        self.maxsize = maxsize
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # File già presenti su disco, dal meno al più recente
+        self.files = OrderedDict()
+        if path is not None:
+            os.makedirs(path, exist_ok = True)
+            entries = [entry for entry in os.scandir(path) if entry.name.endswith('.npy')]
+            for entry in sorted(entries, key = lambda entry: entry.stat().st_mtime):
+                self.files[entry.name[:-4]] = entry.stat().st_size
+
+    def key(self, ring, stage):
+
+        """Chiave di uno step applicato a un Ring (hash delle coordinate, del nome e dei parametri)."""
+
+        name, title, function, params, dependent = stage
+        lat, lon = ring.coords()
+        digest = hashlib.sha1()
+        digest.update(np.ascontiguousarray(lat, dtype = '<f8').tobytes())
+        digest.update(np.ascontiguousarray(lon, dtype = '<f8').tobytes())
+        digest.update(repr(samp.stage_key(stage)).encode())
+
+        # Con il limite allo scarto conta anche il poligono originale (Sampling.deviation_bound)
+        if params.get('max_deviation_meter') is not None:
+            digest.update(b'bound')
+            digest.update(np.ascontiguousarray(ring.lat, dtype = '<f8').tobytes())
+            digest.update(np.ascontiguousarray(ring.lon, dtype = '<f8').tobytes())
+            digest.update(np.ascontiguousarray(ring.idx, dtype = '<i8').tobytes())
+
+        return digest.hexdigest()
+
+    def get(self, key):
+
+        """Posizioni salvate per la chiave, oppure None se la chiave non è in cache."""
+
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits = self.hits + 1
+            return self.memory[key]
+
+        if key in self.files:
+            filename = os.path.join(self.path, key + '.npy')
+            try:
+                positions = np.load(filename)
+            except OSError:
+                del self.files[key]
+            else:
+                os.utime(filename)
+                self.files.move_to_end(key)
+                self.disk_hits = self.disk_hits + 1
+                self.put_memory(key, positions)
+                return positions
+
+        self.misses = self.misses + 1
+        return None
+
+    def put(self, key, positions):
+
+        """Salva le posizioni per la chiave (in memoria e, se c'è, su disco)."""
+
+        self.put_memory(key, positions)
+
+        if self.path is not None:
+            filename = os.path.join(self.path, key + '.npy')
+            np.save(filename, positions)
+            self.files[key] = os.path.getsize(filename)
+            self.files.move_to_end(key)
+
+            # Eliminazione dei file usati meno di recente
+            while sum(self.files.values()) > self.max_bytes and len(self.files) > 1:
+                old_key, _ = self.files.popitem(last = False)
+                try:
+                    os.remove(os.path.join(self.path, old_key + '.npy'))
+                except OSError:
+                    pass
+
+    def put_memory(self, key, positions):
+
+        self.memory[key] = positions
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last = False)
+
+    def run(self, ring, stage):
+
+        """Esegue uno step su un Ring, cercando prima il risultato nella cache."""
+
+        name, title, function, params, dependent = stage
+        key = self.key(ring, stage)
+        positions = self.get(key)
+
+        if positions is None:
+            new_ring = function(ring, **params)
+            positions = np.searchsorted(ring.idx, new_ring.idx)
+            self.put(key, positions)
+            return new_ring
+
+        return ring.subset(ring.idx[positions])
+
+    def stats(self):
+
+        """Contatori della cache."""
+
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'memory_entries': len(self.memory), 'disk_entries': len(self.files),
+                'disk_bytes': sum(self.files.values())}
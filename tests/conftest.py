@@ -0,0 +1,18 @@
+#************************************************************************************
+# Configurazione dei test: il pacchetto deve essere importabile come GeoSampling
+#************************************************************************************
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se la cartella del repository non si chiama GeoSampling, il pacchetto è raggiunto
+# con un link simbolico in una cartella temporanea
+if os.path.basename(ROOT) == 'GeoSampling':
+    sys.path.insert(0, os.path.dirname(ROOT))
+else:
+    link_dir = tempfile.mkdtemp()
+    os.symlink(ROOT, os.path.join(link_dir, 'GeoSampling'))
+    sys.path.insert(0, link_dir)
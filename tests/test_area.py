@@ -0,0 +1,65 @@
+#************************************************************************************
+# Test del metodo di Visvalingam-Whyatt: la rimozione si ferma a min_points punti
+#************************************************************************************
+
+from GeoSampling import RemovingArea as ra
+from GeoSampling import Sampling as samp
+from GeoSampling import Benchmark as bm
+
+import numpy as np
+import pytest
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+RINGS = [bm.synthetic_ring(n, seed) for n, seed in [(30, 0), (300, 1), (2000, 2)]]
+
+def coords(ring):
+
+    # Poligono ciclico, senza la riga di chiusura
+    return ring['Latitude'].to_numpy()[:-1], ring['Longitude'].to_numpy()[:-1]
+
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('min_points', [3, 4, 10])
+def test_visvalingam_stops_at_min_points(ring, min_points):
+
+    # Con un'area minima enorme si toglierebbero tutti i punti: ne restano min_points
+    lat, lon = coords(ring)
+
+    assert ra.visvalingam_mask(lat, lon, 1e9, min_points).sum() == min_points
+
+
+@pytest.mark.parametrize('min_points', [3, 4, 10])
+def test_visvalingam_few_points(min_points):
+
+    # Se i punti non sono più di min_points, restano tutti
+    lat, lon = coords(RINGS[0])
+
+    assert ra.visvalingam_mask(lat[:min_points], lon[:min_points], 1e9, min_points).all()
+    assert ra.visvalingam_mask(lat[:min_points - 1], lon[:min_points - 1], 1e9, min_points).all()
+
+
+@pytest.mark.parametrize('ring', RINGS)
+def test_visvalingam_small_area(ring):
+
+    # Con un'area minima piccola la rimozione si ferma prima di min_points
+    lat, lon = coords(ring)
+    keep = ra.visvalingam_mask(lat, lon, 1e-14, 4)
+
+    assert 4 < keep.sum() < len(lat)
+
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('minPoints', [3, 4, 5, 10])
+def test_sampling_visvalingam_min_points(ring, minPoints):
+
+    sampled = samp.Sampling(ring, 1e4, visvalingam = True, minPoints = minPoints)
+
+    assert len(sampled) == minPoints
+    assert np.all(np.diff(sampled.index) > 0)
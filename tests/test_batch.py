@@ -0,0 +1,85 @@
+#************************************************************************************
+# Test del sampling di tanti poligoni: con uno o più processi il risultato deve
+# essere lo stesso del sampling di un poligono alla volta
+#************************************************************************************
+
+from GeoSampling import BatchSampling as bs
+from GeoSampling import Sampling as samp
+from GeoSampling import Benchmark as bm
+
+import numpy as np
+import pandas as pd
+import pytest
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+SIZES = [40, 300, 8, 1200, 75, 5]
+
+def long_table():
+
+    # db lungo come quello di db_preparation: una riga per punto, con la riga di chiusura
+    frames = []
+    for k, n in enumerate(SIZES):
+        ring = bm.synthetic_ring(n, k)
+        ring.insert(0, 'ID_EXT', 'P%02d' % k)
+        frames.append(ring)
+
+    return pd.concat(frames, ignore_index = True)
+
+
+def expected(figures, **params):
+
+    # Sampling di un poligono alla volta
+    frames = []
+    for id_ext, polygon in figures.groupby('ID_EXT', sort = False):
+        sampled = samp.Sampling(polygon[['Latitude', 'Longitude']].reset_index(drop = True), **params)
+        frames.append(pd.DataFrame({'ID_EXT': id_ext, 'Point': sampled.index.to_numpy(),
+                                    'Latitude': sampled['Latitude'].to_numpy(),
+                                    'Longitude': sampled['Longitude'].to_numpy()}))
+
+    return pd.concat(frames, ignore_index = True)
+
+
+FIGURES = long_table()
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch_matches_single_polygons(workers):
+
+    sampled, failed = bs.BatchSampling(FIGURES, workers = workers, chunk_points = 500, detail = 5)
+
+    assert len(failed) == 0
+    pd.testing.assert_frame_equal(sampled, expected(FIGURES, detail = 5), check_dtype = False)
+
+
+def test_batch_workers_agree():
+
+    params = {'detail': 2, 'finelength': False}
+    one, _ = bs.BatchSampling(FIGURES, workers = 1, chunk_points = 300, **params)
+    two, _ = bs.BatchSampling(FIGURES, workers = 2, chunk_points = 300, **params)
+
+    pd.testing.assert_frame_equal(one, two)
+
+
+def test_batch_point_is_position_in_polygon():
+
+    # Point è la posizione nel poligono, non la riga del db lungo
+    sampled, _ = bs.BatchSampling(FIGURES, workers = 1, detail = 5)
+
+    for k, n in enumerate(SIZES):
+        points = sampled.loc[sampled['ID_EXT'] == 'P%02d' % k, 'Point']
+        assert points.min() >= 0 and points.max() < n
+
+
+def test_missing_id_rejected():
+
+    figures = FIGURES.copy()
+    figures.loc[3, 'ID_EXT'] = np.nan
+
+    with pytest.raises(ValueError, match = 'ID_EXT'):
+        bs.split_polygons(figures)
@@ -0,0 +1,79 @@
+#************************************************************************************
+# Test dello scarto massimo ammesso (max_deviation_meter): nessun punto originale
+# deve finire più lontano del limite dal segmento che lo sostituisce
+#************************************************************************************
+
+from GeoSampling import Sampling as samp
+from GeoSampling import Metrics as mtr
+from GeoSampling import Benchmark as bm
+
+import math
+import pytest
+
+#-----------------------------------------------------
+# Implementazione di riferimento
+#-----------------------------------------------------
+
+def ref_deviation(orig, sampled):
+
+    # Scarto di ogni punto originale dal segmento tra i due punti rimasti prima e dopo di lui,
+    # girando intorno al poligono (anche quando è tolto il punto 0), in metri
+    lat = orig['Latitude'].tolist()[:-1]
+    lon = orig['Longitude'].tolist()[:-1]
+    n = len(lat)
+    kept = sorted(sampled.index)
+
+    totalmax = 0
+    for k, a in enumerate(kept):
+        b = kept[(k + 1) % len(kept)]
+        base_lat, base_lon = lat[b] - lat[a], lon[b] - lon[a]
+        base = math.hypot(base_lat, base_lon)
+        for label in range(a + 1, b if b > a else b + n):
+            point_lat, point_lon = lat[label % n] - lat[a], lon[label % n] - lon[a]
+            if base > 0:
+                distance = abs(base_lat*point_lon - base_lon*point_lat)/base
+            else:
+                distance = math.hypot(point_lat, point_lon)
+            totalmax = max(totalmax, distance)
+
+    return 2*math.pi*6371000*totalmax/360
+
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+RINGS = [bm.synthetic_ring(n, seed) for n, seed in [(50, 2), (50, 5), (300, 0), (2000, 1)]]
+
+# Il limite non vale per il metodo dei punti sovrapposti: con par_identity = True toglie
+# solo i punti identici, che non hanno scarto
+MODES = [{}, {'finelength': False}, {'visvalingam': True}]
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('bound', [0.5, 2, 5])
+@pytest.mark.parametrize('mode', MODES)
+def test_max_deviation(ring, bound, mode):
+
+    sampled = samp.Sampling(ring, 10, par_identity = True, max_deviation_meter = bound, **mode)
+
+    assert ref_deviation(ring, sampled) <= bound*(1 + 1e-9)
+
+    # Se il punto 0 è tolto, maxDistance usa come punto prima del suo gruppo la riga N (uguale alla
+    # riga 0) e non l'ultimo punto rimasto: il confronto con maxDistance vale se il punto 0 è rimasto
+    if 0 in sampled.index:
+        assert mtr.maxDistance(ring, sampled) <= bound*(1 + 1e-9)
+
+
+@pytest.mark.parametrize('ring', RINGS)
+def test_max_deviation_limits_sampling(ring):
+
+    # Senza limite lo scarto supera 0.5 metri: il limite toglie meno punti
+    free = samp.Sampling(ring, 10, par_identity = True)
+    bounded = samp.Sampling(ring, 10, par_identity = True, max_deviation_meter = 0.5)
+
+    assert ref_deviation(ring, free) > 0.5
+    assert len(bounded) > len(free)
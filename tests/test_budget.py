@@ -0,0 +1,77 @@
+#************************************************************************************
+# Test del limite sul numero di punti (max_points): ricerca del dettaglio
+# con budget_detail, anche quando qualche step viene ignorato (fallback)
+#************************************************************************************
+
+from GeoSampling import Sampling as samp
+from GeoSampling import Benchmark as bm
+
+import pytest
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+RINGS = [bm.synthetic_ring(n, seed) for n, seed in [(300, 0), (2000, 1)]]
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('max_points', [5, 10, 50, 150])
+@pytest.mark.parametrize('visvalingam', [False, True])
+def test_max_points(ring, max_points, visvalingam):
+
+    sampled = samp.Sampling(ring, 10, max_points = max_points, visvalingam = visvalingam)
+    detail = sampled.attrs['detail']
+
+    assert len(sampled) <= max_points
+    assert sampled.attrs['quality']['reduction'] == pytest.approx(1 - len(sampled)/(len(ring) - 1))
+
+    # Stesso risultato del sampling con il dettaglio trovato
+    expected = samp.Sampling(ring, detail, visvalingam = visvalingam)
+    assert sampled.index.tolist() == expected.index.tolist()
+
+
+def test_max_points_fallback():
+
+    # Con un dettaglio grande gli step lasciano meno di minPoints punti e vengono ignorati:
+    # i punti aumentano, e la ricerca deve tornare verso dettagli più piccoli
+    sampled = samp.Sampling(bm.synthetic_ring(2000, 1), 10, max_points = 5)
+
+    assert len(sampled) == 5
+
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('max_points', [2, 3])
+def test_max_points_below_min_points(ring, max_points):
+
+    # Meno di minPoints punti non si possono ottenere: il risultato con meno punti tra quelli provati
+    sampled = samp.Sampling(ring, 10, max_points = max_points, minPoints = 4)
+
+    assert len(sampled) == 4
+
+
+def test_max_points_analysis(monkeypatch):
+
+    # L'analisi è fatta una volta, sugli step del dettaglio trovato
+    titles = []
+    monkeypatch.setattr(samp, 'analysisFunction', lambda dati, title: titles.append(title))
+
+    sampled = samp.Sampling(RINGS[0], 10, max_points = 20, analysis = True)
+    stages = samp.sampling_stages(sampled.attrs['detail'])
+
+    assert titles == [title for name, title, function, params, dependent in stages]
+
+
+@pytest.mark.parametrize('options', [{}, {'clustering': True}, {'clustering': True, 'ifzoom': True},
+                                     {'visvalingam': True}, {'finelength': False}])
+def test_detail_dependent_stages(options):
+
+    # Uno step è segnato come dipendente dal dettaglio se e solo se i suoi parametri cambiano con detail
+    stages = samp.sampling_stages(10, **options)
+    other = samp.sampling_stages(20, **options)
+
+    for stage, other_stage in zip(stages, other):
+        assert stage[4] == (stage[3] != other_stage[3])
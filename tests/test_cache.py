@@ -0,0 +1,117 @@
+#************************************************************************************
+# Test della cache degli step: il sampling con la cache deve dare lo stesso
+# risultato del sampling senza cache
+#************************************************************************************
+
+from GeoSampling import StageCache as sc
+from GeoSampling import Sampling as samp
+from GeoSampling import Benchmark as bm
+
+import numpy as np
+import pandas as pd
+import pytest
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+RINGS = [bm.synthetic_ring(n, seed) for n, seed in [(50, 0), (500, 1), (2000, 2)]]
+
+OPTIONS = [{}, {'finelength': False}, {'visvalingam': True}, {'max_deviation_meter': 1},
+           {'visvalingam': True, 'max_deviation_meter': 1}]
+
+
+def near_duplicates(seed, trials = 300):
+
+    """Coppie di poligoni che differiscono solo per un punto quasi duplicato
+
+    Nel primo poligono il punto k è una copia del punto prima, nel secondo è spostato di poco, ma
+    arrotondato alla quarta cifra decimale è uguale al punto prima: il metodo dei punti sovrapposti
+    lo toglie in tutti e due i casi, quindi i punti in ingresso agli step successivi sono gli stessi,
+    mentre i punti originali (che contano per max_deviation_meter) sono diversi.
+    """
+
+    rng = np.random.default_rng(seed)
+    pairs = []
+
+    for _ in range(trials):
+        n = 12
+        angles = np.sort(rng.uniform(0, 2*np.pi, n))
+        lat = 45 + 0.0008*np.cos(angles)
+        lon = 9 + 0.0008*np.sin(angles)
+        k = rng.integers(1, n - 1)
+
+        first = pd.DataFrame({'Latitude': np.insert(lat, k, lat[k-1]),
+                              'Longitude': np.insert(lon, k, lon[k-1])})
+        second = pd.DataFrame({'Latitude': np.insert(lat, k, lat[k-1] + rng.uniform(-4e-5, 4e-5)),
+                               'Longitude': np.insert(lon, k, lon[k-1] + rng.uniform(-4e-5, 4e-5))})
+        detail, bound = rng.uniform(2, 30), rng.uniform(0.5, 5)
+
+        if (np.round(second.iloc[k], 4) == np.round(second.iloc[k-1], 4)).all():
+            pairs.append((first, second, detail, bound))
+
+    return pairs
+
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('options', OPTIONS)
+def test_cached_equals_uncached(ring, options):
+
+    cache = sc.StageCache()
+    expected = samp.Sampling(ring, 10, **options)
+
+    pd.testing.assert_frame_equal(samp.Sampling(ring, 10, cache = cache, **options), expected)
+    pd.testing.assert_frame_equal(samp.Sampling(ring, 10, cache = cache, **options), expected)
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+def test_hits(options):
+
+    # Al secondo sampling tutti gli step sono letti dalla cache
+    cache = sc.StageCache()
+    stages = len(samp.sampling_stages(10, **options))
+
+    samp.Sampling(RINGS[1], 10, cache = cache, **options)
+    assert cache.stats()['hits'] == 0
+    assert cache.stats()['misses'] == stages
+
+    samp.Sampling(RINGS[1], 10, cache = cache, **options)
+    assert cache.stats()['hits'] == stages
+    assert cache.stats()['misses'] == stages
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+def test_disk_cache(tmp_path, options):
+
+    # Una nuova cache sulla stessa cartella legge i risultati dal disco
+    expected = samp.Sampling(RINGS[1], 10, **options)
+    samp.Sampling(RINGS[1], 10, cache = sc.StageCache(path = str(tmp_path)), **options)
+
+    cache = sc.StageCache(path = str(tmp_path))
+    pd.testing.assert_frame_equal(samp.Sampling(RINGS[1], 10, cache = cache, **options), expected)
+    assert cache.stats()['disk_hits'] == len(samp.sampling_stages(10, **options))
+    assert cache.stats()['misses'] == 0
+
+
+def test_bound_no_collisions():
+
+    # Stessi punti in ingresso agli step, poligoni originali diversi: con max_deviation_meter
+    # i risultati possono essere diversi, e la cache non deve confonderli
+    different = 0
+
+    for first, second, detail, bound in near_duplicates(0):
+        expected = samp.Sampling(second, detail, max_deviation_meter = bound)
+
+        cache = sc.StageCache()
+        samp.Sampling(first, detail, max_deviation_meter = bound, cache = cache)
+        sampled = samp.Sampling(second, detail, max_deviation_meter = bound, cache = cache)
+        pd.testing.assert_frame_equal(sampled, expected)
+
+        other = samp.Sampling(first, detail, max_deviation_meter = bound)
+        different = different + (len(other) != len(expected))
+
+    assert different > 0
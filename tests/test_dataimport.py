@@ -0,0 +1,76 @@
+#************************************************************************************
+# Test dell'importazione del GML: l'importazione a blocchi (db_stream) deve dare
+# gli stessi punti di db_preparation
+#************************************************************************************
+
+from GeoSampling import DataImport as di
+from GeoSampling import Benchmark as bm
+
+import numpy as np
+import pandas as pd
+import pytest
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+def gml(ring):
+
+    coords = ' '.join('%r,%r' % (lon, lat) for lat, lon in zip(ring['Latitude'], ring['Longitude']))
+    return ('<gml:Polygon><gml:outerBoundaryIs><gml:LinearRing><gml:coordinates decimal="." cs="," ts=" ">'
+            + coords + '</gml:coordinates></gml:LinearRing></gml:outerBoundaryIs></gml:Polygon>')
+
+
+SIZES = [10, 250, 4, 60, 1000, 33, 7]
+
+FIGURES = pd.DataFrame({'ID_EXT': ['F%d' % k for k in range(len(SIZES))],
+                        'AREA': np.arange(len(SIZES))*1.5,
+                        'GEOM': [gml(bm.synthetic_ring(n, k)) for k, n in enumerate(SIZES)]})
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('chunksize', [1, 3, len(SIZES)])
+def test_stream_matches_preparation(chunksize):
+
+    expected = di.db_preparation(FIGURES.copy())
+    chunks = [FIGURES.iloc[k:k + chunksize] for k in range(0, len(FIGURES), chunksize)]
+
+    attributes, lats, lons, ids = [], [], [], []
+    for chunk_attributes, offsets, lat, lon in di.db_stream(chunks):
+        attributes.append(chunk_attributes)
+        lats.append(lat)
+        lons.append(lon)
+        ids.append(np.repeat(chunk_attributes['ID_EXT'].to_numpy(), np.diff(offsets)))
+
+    assert np.array_equal(np.concatenate(lats), expected['Latitude'].to_numpy())
+    assert np.array_equal(np.concatenate(lons), expected['Longitude'].to_numpy())
+    assert np.array_equal(np.concatenate(ids), expected['ID_EXT'].to_numpy())
+    pd.testing.assert_frame_equal(pd.concat(attributes), FIGURES.drop(columns = 'GEOM'))
+
+
+def test_parse_gml_missing_geometry():
+
+    for geom in [np.nan, None, '']:
+        lat, lon = di.parse_gml(geom)
+        assert len(lat) == 0 and len(lon) == 0
+
+
+def test_parse_gml_skips_bare_dot():
+
+    lat, lon = di.parse_gml('<gml:coordinates>9.1,45.2 .,. 9.2,45.3 .5,-1.</gml:coordinates>')
+
+    assert lat.tolist() == [45.2, 45.3, -1.0]
+    assert lon.tolist() == [9.1, 9.2, 0.5]
+
+
+def test_stream_with_missing_geometry():
+
+    figures = FIGURES.copy()
+    figures.loc[2, 'GEOM'] = np.nan
+
+    (attributes, offsets, lat, lon), = di.db_stream([figures])
+
+    assert offsets[3] == offsets[2]
+    assert len(lat) == sum(SIZES) + len(SIZES) - (SIZES[2] + 1)
@@ -0,0 +1,31 @@
+#************************************************************************************
+# Test del DBSCAN per più valori di eps
+#************************************************************************************
+
+from GeoSampling import DBSCANsampling as dbsamp
+from GeoSampling import Periodics as pcs
+from GeoSampling import Benchmark as bm
+
+import numpy as np
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+def test_sweep_matches_single_eps():
+
+    dati = pcs.reset_data(bm.synthetic_ring(300, 0))
+    sweep = dbsamp.DBSCANsweep(dati, [0.5, 2, 5])
+
+    for eps_meter in [0.5, 2, 5]:
+        labels = dbsamp.DBSCANmodel(dati.copy(), eps_meter)['Labels'].to_numpy()
+        assert np.array_equal(sweep[eps_meter].to_numpy(), labels)
+
+
+def test_sweep_without_eps():
+
+    dati = pcs.reset_data(bm.synthetic_ring(50, 0))
+    sweep = dbsamp.DBSCANsweep(dati, [])
+
+    assert sweep.shape == (len(dati), 0)
+    assert sweep.index.equals(dati.index)
@@ -0,0 +1,28 @@
+#************************************************************************************
+# Test dell'import del sampling: le librerie grafiche e Scikit-Learn
+# devono essere importate solo quando servono
+#************************************************************************************
+
+from GeoSampling import Benchmark as bm
+
+import pytest
+
+# Stesso budget di Benchmark.check_import_budget (tempo misurato: circa 0.3s)
+BUDGET = 1.0
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('module', bm.HEADLESS_MODULES)
+def test_headless_import(module):
+
+    elapsed, loaded = bm.import_time([module])
+
+    assert loaded == []
+    assert elapsed < BUDGET
+
+
+def test_headless_modules():
+
+    assert bm.check_import_budget(BUDGET) < BUDGET
@@ -0,0 +1,166 @@
+#************************************************************************************
+# Test delle metriche: i calcoli sugli array devono dare gli stessi risultati
+# dei calcoli gruppo per gruppo usati prima
+#************************************************************************************
+
+from GeoSampling import Metrics as mtr
+from GeoSampling import Sampling as samp
+from GeoSampling import Periodics as pcs
+from GeoSampling import Benchmark as bm
+
+import math
+import numpy as np
+import pytest
+
+#-----------------------------------------------------
+# Implementazioni di riferimento (un gruppo alla volta)
+#-----------------------------------------------------
+
+def ref_groups(orig, sampled):
+
+    remaining = set(sampled.index)
+    groups = []
+    for label in pcs.reset_data(orig).index:
+        if label in remaining:
+            continue
+        if groups and groups[-1][-1] == label - 1:
+            groups[-1].append(label)
+        else:
+            groups.append([label])
+
+    return groups
+
+
+def ref_area(lat, lon):
+
+    # Formula di Gauss, con i vertici traslati rispetto al primo
+    x = [value - lat[0] for value in lat]
+    y = [value - lon[0] for value in lon]
+    n = len(x)
+
+    return abs(sum(x[i]*y[(i+1) % n] - x[(i+1) % n]*y[i] for i in range(n)))/2
+
+
+def ref_group_vertices(orig, group):
+
+    # Punto prima, punti tolti e punto dopo, dai dati con condizioni periodiche
+    padded = pcs.PC(orig)
+    labels = [group[0] - 1] + group + [group[-1] + 1]
+
+    return padded.loc[labels, 'Latitude'].tolist(), padded.loc[labels, 'Longitude'].tolist()
+
+
+def ref_diff_abs_area(orig, sampled):
+
+    return sum(ref_area(*ref_group_vertices(orig, group)) for group in ref_groups(orig, sampled))
+
+
+def ref_max_distance(orig, sampled):
+
+    # Distanza punto-retta AB di ogni punto tolto (se A e B coincidono, distanza da A), in metri
+    totalmax = 0
+    for group in ref_groups(orig, sampled):
+        lat, lon = ref_group_vertices(orig, group)
+        base_lat, base_lon = lat[-1] - lat[0], lon[-1] - lon[0]
+        base = math.hypot(base_lat, base_lon)
+        for k in range(1, len(lat) - 1):
+            point_lat, point_lon = lat[k] - lat[0], lon[k] - lon[0]
+            if base > 0:
+                distance = abs(base_lat*point_lon - base_lon*point_lat)/base
+            else:
+                distance = math.hypot(point_lat, point_lon)
+            totalmax = max(totalmax, distance)
+
+    return 2*math.pi*6371000*totalmax/360
+
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+def pairs():
+
+    result = []
+    rng = np.random.default_rng(0)
+
+    for n, seed in [(30, 0), (400, 1), (1500, 2)]:
+        orig = bm.synthetic_ring(n, seed)
+        points = pcs.reset_data(orig)
+
+        # Sampling vero, sottoinsiemi casuali, nessun punto tolto
+        result.append((orig, samp.Sampling(orig, 5)))
+        for fraction in [0.2, 0.7]:
+            keep = np.sort(rng.choice(n, max(3, int(fraction*n)), replace = False))
+            result.append((orig, points.iloc[keep]))
+        result.append((orig, points))
+
+        # Tolti il primo e l'ultimo punto (gruppi sul bordo)
+        result.append((orig, points.iloc[1:-1]))
+        result.append((orig, points.iloc[2:-3]))
+
+    return result
+
+
+PAIRS = pairs()
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('orig, sampled', PAIRS)
+def test_lost_runs(orig, sampled):
+
+    lost, starts, ends = mtr.lost_runs(orig, sampled)
+    groups = [lost[start:end].tolist() for start, end in zip(starts, ends)]
+
+    assert groups == ref_groups(orig, sampled)
+
+
+@pytest.mark.parametrize('orig, sampled', PAIRS)
+def test_diff_points(orig, sampled):
+
+    df = mtr.diffPoints(orig, sampled)
+    groups = ref_groups(orig, sampled)
+
+    assert df['LostPoints'].tolist() == [label for group in groups for label in group]
+    assert df['id_period'].tolist() == [k + 1 for k, group in enumerate(groups) for label in group]
+
+
+@pytest.mark.parametrize('orig, sampled', PAIRS)
+def test_diff_abs_area(orig, sampled):
+
+    expected = ref_diff_abs_area(orig, sampled)
+
+    assert mtr.diffAbsArea(orig, sampled) == pytest.approx(expected, rel = 1e-9, abs = 1e-20)
+
+
+@pytest.mark.parametrize('n', [3, 4, 50])
+def test_ring_areas(n):
+
+    # Tanti poligoni uno dopo l'altro, anche con tre soli vertici
+    rings = [pcs.reset_data(bm.synthetic_ring(n, seed)) for seed in range(4)]
+    lat = np.concatenate([ring['Latitude'].to_numpy() for ring in rings])
+    lon = np.concatenate([ring['Longitude'].to_numpy() for ring in rings])
+    first = np.cumsum([0] + [len(ring) for ring in rings[:-1]])
+
+    expected = [ref_area(ring['Latitude'].tolist(), ring['Longitude'].tolist()) for ring in rings]
+
+    assert mtr.ring_areas(lat, lon, first) == pytest.approx(expected, rel = 1e-9)
+    assert mtr.PolyArea(bm.synthetic_ring(n, 0)) == pytest.approx(expected[0], rel = 1e-9)
+
+
+@pytest.mark.parametrize('orig, sampled', PAIRS)
+def test_max_distance(orig, sampled):
+
+    expected = ref_max_distance(orig, sampled)
+
+    assert mtr.maxDistance(orig, sampled) == pytest.approx(expected, rel = 1e-9, abs = 1e-12)
+
+
+@pytest.mark.parametrize('orig, sampled', PAIRS)
+def test_quality_report(orig, sampled):
+
+    report = mtr.quality_report(orig, sampled, 5)
+
+    assert report['maxDistance'] == pytest.approx(ref_max_distance(orig, sampled), rel = 1e-9, abs = 1e-12)
+    assert report['diffAbsArea'] == pytest.approx(ref_diff_abs_area(orig, sampled), rel = 1e-9, abs = 1e-20)
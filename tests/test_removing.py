@@ -0,0 +1,194 @@
+#************************************************************************************
+# Test dei metodi di rimozione: le maschere calcolate sugli array devono dare gli
+# stessi punti della rimozione in-place, un punto alla volta, usata prima
+#************************************************************************************
+
+from GeoSampling import RemovingPoints as rp
+from GeoSampling import RemovingLength as rl
+from GeoSampling import Benchmark as bm
+
+import math
+import numpy as np
+import pytest
+
+#-----------------------------------------------------
+# Implementazioni di riferimento (rimozione in-place)
+#-----------------------------------------------------
+
+def ref_overlap(lat, lon, identity = True, acc = 4):
+
+    points = list(range(len(lat)))
+    i = 0
+    while i < len(points) - 1:
+        a, b = points[i], points[i+1]
+        if identity:
+            same = lat[a] == lat[b] and lon[a] == lon[b]
+        else:
+            same = np.round(lat[a], acc) == np.round(lat[b], acc) and np.round(lon[a], acc) == np.round(lon[b], acc)
+        if same:
+            del points[i+1]
+        else:
+            i = i + 1
+
+    return points
+
+
+def ref_median(lat, lon, acc = 4):
+
+    points = list(range(len(lat)))
+    i = 0
+    while i < len(points) - 2:
+        a, b, c = points[i:i+3]
+        medLat = (lat[a] + lat[c])/2
+        medLong = (lon[a] + lon[c])/2
+        if np.round(medLat, acc) == np.round(lat[b], acc) and np.round(medLong, acc) == np.round(lon[b], acc):
+            del points[i+1]
+        else:
+            i = i + 1
+
+    return points
+
+
+def ref_buffer(lat, lon, tol):
+
+    points = list(range(len(lat)))
+    i = 0
+    while i < len(points) - 2:
+        a, b, c = points[i:i+3]
+        dx, dy = lat[c] - lat[a], lon[c] - lon[a]
+        px, py = lat[b] - lat[a], lon[b] - lon[a]
+        den = dx*dx + dy*dy
+        t = min(max((px*dx + py*dy)/den, 0.0), 1.0) if den > 0 else 0.0
+        if math.hypot(px - t*dx, py - t*dy) < tol:
+            del points[i+1]
+        else:
+            i = i + 1
+
+    return points
+
+
+def length(lat, lon, a, b):
+    return math.sqrt((lat[b] - lat[a])**2 + (lon[b] - lon[a])**2)
+
+
+def ref_length(lat, lon, lenmin):
+
+    points = list(range(len(lat)))
+    i = 0
+    while i < len(points) - 1:
+        if length(lat, lon, points[i], points[i+1]) > lenmin:
+            i = i + 1
+        else:
+            del points[i+1]
+
+    return points
+
+
+def ref_finelength(lat, lon, lenmin):
+
+    # Una lunghezza uguale alla soglia non è corta
+    points = list(range(len(lat)))
+    i = 0
+    while i < len(points) - 2:
+        a, b, c = points[i:i+3]
+        if not length(lat, lon, b, c) < lenmin:
+            i = i + 2
+        elif length(lat, lon, a, b) < lenmin:
+            del points[i+1]
+        else:
+            i = i + 1
+
+    return points
+
+
+def kept(mask):
+    return np.flatnonzero(mask).tolist()
+
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+RINGS = [bm.synthetic_ring(n, seed) for n, seed in [(50, 0), (300, 1), (1000, 2)]]
+
+def coords(ring):
+    return ring['Latitude'].to_numpy(), ring['Longitude'].to_numpy()
+
+
+def meters(value):
+    return 360*value/(2*math.pi*6371000)
+
+
+# Pochi punti: nessun punto può essere tolto da una terna
+SHORT = [(np.array([]), np.array([])), (np.array([45.0]), np.array([9.0])),
+         (np.array([45.0, 45.0]), np.array([9.0, 9.0]))]
+
+# Lati di lunghezza esattamente 1 e 0.5 (in gradi)
+STEPS = np.cumsum([0, 1, 0.5, 0.5, 1, 1, 0.5, 1, 0.5, 0.5, 0.5, 1])
+LINE = (STEPS, np.zeros(len(STEPS)))
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('identity', [True, False])
+def test_overlap_mask(ring, identity):
+
+    lat, lon = coords(ring)
+    assert kept(rp.overlap_mask(lat, lon, identity)) == ref_overlap(lat, lon, identity)
+
+
+@pytest.mark.parametrize('ring', RINGS)
+def test_median_mask(ring):
+
+    lat, lon = coords(ring)
+    assert kept(rp.median_mask(lat, lon)) == ref_median(lat, lon)
+
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('tol_meter', [0.5, 2.5, 10])
+def test_buffer_mask(ring, tol_meter):
+
+    lat, lon = coords(ring)
+    assert kept(rp.buffer_mask(lat, lon, meters(tol_meter))) == ref_buffer(lat, lon, meters(tol_meter))
+
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('lenmin_meter', [1, 5, 20])
+def test_length_masks(ring, lenmin_meter):
+
+    lat, lon = coords(ring)
+    lenmin = meters(lenmin_meter)
+    assert kept(rl.length_mask(lat, lon, lenmin)) == ref_length(lat, lon, lenmin)
+    assert kept(rl.finelength_mask(lat, lon, lenmin)) == ref_finelength(lat, lon, lenmin)
+
+
+@pytest.mark.parametrize('lat, lon', SHORT)
+def test_few_points(lat, lon):
+
+    n = len(lat)
+    assert kept(rp.overlap_mask(lat, lon)) == ref_overlap(lat, lon)
+    assert kept(rp.median_mask(lat, lon)) == list(range(n))
+    assert kept(rp.buffer_mask(lat, lon, 1.0)) == list(range(n))
+    assert kept(rl.length_mask(lat, lon, 1.0)) == ref_length(lat, lon, 1.0)
+    assert kept(rl.finelength_mask(lat, lon, 1.0)) == list(range(n))
+
+
+@pytest.mark.parametrize('lenmin', [0.5, 1.0])
+def test_length_equal_to_threshold(lenmin):
+
+    lat, lon = LINE
+    assert kept(rl.length_mask(lat, lon, lenmin)) == ref_length(lat, lon, lenmin)
+    assert kept(rl.finelength_mask(lat, lon, lenmin)) == ref_finelength(lat, lon, lenmin)
+
+
+def test_finelength_equal_to_threshold_keeps_points():
+
+    # Tutti i lati sono lunghi esattamente quanto la soglia: per finelength nessun lato è corto,
+    # per length un lato uguale alla soglia è corto (si toglie un punto ogni due)
+    lat = np.arange(8, dtype = float)
+    lon = np.zeros(8)
+
+    assert rl.finelength_mask(lat, lon, 1.0).all()
+    assert kept(rl.length_mask(lat, lon, 1.0)) == [0, 2, 4, 6]
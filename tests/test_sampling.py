@@ -0,0 +1,76 @@
+#************************************************************************************
+# Test del sampling: gli step applicati al Ring devono dare lo stesso risultato
+# degli step applicati ai dataframe con le condizioni al contorno (PC/RC)
+#************************************************************************************
+
+from GeoSampling import Sampling as samp
+from GeoSampling import RemovingPoints as rp
+from GeoSampling import RemovingLength as rl
+from GeoSampling import Periodics as pcs
+from GeoSampling import Benchmark as bm
+
+import pandas as pd
+import pytest
+
+#-----------------------------------------------------
+# Implementazione di riferimento (dataframe, PC/RC)
+#-----------------------------------------------------
+
+def ref_sampling(dati, detail = 10, par_identity = False, par_buffer = 0.5, par_length = 2,
+                 finelength = True, minPoints = 4):
+
+    def step(previous, function, **params):
+        result = pcs.RC(function(pcs.PC(previous), **params))
+        return previous if len(result) < minPoints else result
+
+    orig_dati = pcs.reset_data(dati)
+
+    result = step(orig_dati, rp.rem_overlap, identity = par_identity)
+    result = step(result, rp.rem_median)
+    result = step(result, rp.rem_buffer, tol_meter = detail*par_buffer)
+    if finelength:
+        result = step(result, rl.rem_finelength, lenmin_meter = par_length*detail)
+    else:
+        result = step(result, rl.rem_length, lenmin_meter = par_length*detail)
+    result = step(result, rp.rem_buffer, tol_meter = detail*par_buffer)
+
+    return result
+
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+RINGS = [bm.synthetic_ring(n, seed) for n, seed in [(40, 0), (500, 1), (2000, 3)]]
+
+# Quadrato con un punto sulla media di un lato: gli step lasciano meno di minPoints punti
+SQUARE = pd.DataFrame({'Latitude': [45.0, 45.0, 45.0, 45.001, 45.001, 45.0],
+                       'Longitude': [9.0, 9.0005, 9.001, 9.001, 9.0, 9.0]})
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+@pytest.mark.parametrize('ring', RINGS)
+@pytest.mark.parametrize('detail', [1, 5, 20])
+@pytest.mark.parametrize('finelength', [True, False])
+def test_ring_pipeline(ring, detail, finelength):
+
+    sampled = samp.Sampling(ring, detail, finelength = finelength)
+    expected = ref_sampling(ring, detail, finelength = finelength)
+
+    pd.testing.assert_frame_equal(sampled, expected)
+
+
+@pytest.mark.parametrize('ring', RINGS[:2])
+def test_ring_pipeline_identity(ring):
+
+    pd.testing.assert_frame_equal(samp.Sampling(ring, 5, par_identity = True),
+                                  ref_sampling(ring, 5, par_identity = True))
+
+
+@pytest.mark.parametrize('minPoints', [3, 4, 5])
+def test_ring_pipeline_fallback(minPoints):
+
+    pd.testing.assert_frame_equal(samp.Sampling(SQUARE, 1000, minPoints = minPoints),
+                                  ref_sampling(SQUARE, 1000, minPoints = minPoints))
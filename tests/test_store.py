@@ -0,0 +1,114 @@
+#************************************************************************************
+# Test del PolygonStore: salvataggio su disco, riapertura e sampling dall'archivio
+#************************************************************************************
+
+from GeoSampling import PolygonStore as ps
+from GeoSampling import BatchSampling as bs
+from GeoSampling import Benchmark as bm
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+#-----------------------------------------------------
+# Dati di prova
+#-----------------------------------------------------
+
+SIZES = [12, 200, 5, 900, 40]
+
+def chunk(positions, **columns):
+
+    # Blocco come quelli di DataImport.db_stream
+    rings = [bm.synthetic_ring(SIZES[k], k) for k in positions]
+    offsets = np.concatenate([[0], np.cumsum([len(ring) for ring in rings])])
+    attributes = pd.DataFrame({'ID_EXT': ['%03d' % k for k in positions], **columns})
+
+    return (attributes, offsets, np.concatenate([ring['Latitude'].to_numpy() for ring in rings]),
+            np.concatenate([ring['Longitude'].to_numpy() for ring in rings]))
+
+
+def stream():
+
+    return [chunk([0, 1], AREA = [1.5, 2.0], FOGLIO = [7, 8], NOTE = ['a', ''],
+                  DATA = pd.to_datetime(['2020-01-01', '2021-06-30'])),
+            chunk([2, 3, 4], AREA = [3.0, 4.5, 5.0], FOGLIO = [9, np.nan, 11], NOTE = ['b', 'c', 'd'],
+                  DATA = pd.to_datetime(['2022-02-02', '2023-03-03', '2024-04-04']))]
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+def test_write_open_roundtrip(tmp_path):
+
+    chunks = stream()
+    store = ps.PolygonStore.write(str(tmp_path / 'store'), chunks)
+    memory = ps.PolygonStore.from_stream(chunks)
+
+    assert len(store) == len(SIZES)
+    assert np.array_equal(store.lat, memory.lat)
+    assert np.array_equal(store.lon, memory.lon)
+    assert np.array_equal(store.offsets, memory.offsets)
+
+    for view, k in zip(store, range(len(SIZES))):
+        ring = bm.synthetic_ring(SIZES[k], k)
+        assert isinstance(view, ps.PolygonView)
+        assert view.id_ext == '%03d' % k
+        pd.testing.assert_frame_equal(view.to_frame(), ring)
+
+
+def test_attribute_dtypes(tmp_path):
+
+    store = ps.PolygonStore.write(str(tmp_path / 'store'), stream())
+    attributes = store.attributes
+
+    # Stringhe senza conversioni, interi promossi a float dal NaN del secondo blocco, date
+    assert attributes['ID_EXT'].tolist() == ['000', '001', '002', '003', '004']
+    assert attributes['AREA'].dtype == np.float64
+    assert attributes['FOGLIO'].dtype == np.float64
+    assert np.isnan(attributes['FOGLIO'].iat[3])
+    assert attributes['DATA'].dtype.kind == 'M'
+    assert attributes['NOTE'].tolist()[2:] == ['b', 'c', 'd']
+
+
+def test_chunks_with_different_columns(tmp_path):
+
+    chunks = stream()
+    chunks[1] = chunk([2], AREA = [1.0])
+
+    with pytest.raises(ValueError):
+        ps.PolygonStore.write(str(tmp_path / 'store'), chunks)
+
+
+def test_missing_dtypes_file(tmp_path):
+
+    path = str(tmp_path / 'store')
+    ps.PolygonStore.write(path, stream())
+    os.remove(os.path.join(path, 'attributes.json'))
+
+    with pytest.raises(FileNotFoundError):
+        ps.PolygonStore.open(path)
+
+
+def test_empty_store(tmp_path):
+
+    store = ps.PolygonStore.write(str(tmp_path / 'store'), [])
+
+    assert len(store) == 0
+    assert list(store.attributes.columns) == ['ID_EXT']
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_store_sampling_matches_batch(tmp_path, workers):
+
+    path = str(tmp_path / 'store')
+    store = ps.PolygonStore.write(path, stream())
+
+    figures = pd.DataFrame({'ID_EXT': np.repeat(store.attributes['ID_EXT'].to_numpy(), store.sizes()),
+                            'Latitude': store.lat, 'Longitude': store.lon})
+
+    sampled, failed = bs.StoreSampling(path, workers = workers, chunk_points = 300, detail = 5)
+    expected, _ = bs.BatchSampling(figures, workers = 1, detail = 5)
+
+    assert len(failed) == 0
+    pd.testing.assert_frame_equal(sampled, expected)
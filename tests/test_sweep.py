@@ -0,0 +1,33 @@
+#************************************************************************************
+# Test dello sweep dei parametri
+#************************************************************************************
+
+from GeoSampling import ParameterSweep as sweep
+from GeoSampling import Sampling as samp
+from GeoSampling import Benchmark as bm
+
+import pandas as pd
+import pytest
+
+RING = bm.synthetic_ring(400, 1)
+
+#-----------------------------------------------------
+# Test
+#-----------------------------------------------------
+
+def test_sweep_matches_sampling():
+
+    grid = {'detail': [1, 5, 20], 'finelength': [True, False]}
+    table, sampled = sweep.ParameterSweep(RING, grid)
+
+    for point, result in zip(sweep.parameter_grid(grid), sampled):
+        pd.testing.assert_frame_equal(result, samp.Sampling(RING, **point))
+
+    assert table['Points'].tolist() == [len(result) for result in sampled]
+
+
+@pytest.mark.parametrize('name', ['max_points', 'analysis', 'memory', 'minPoints', 'detial'])
+def test_sweep_rejects_unknown_parameters(name):
+
+    with pytest.raises(ValueError, match = name):
+        sweep.ParameterSweep(RING, {'detail': [5], name: [True]})